@@ -0,0 +1,73 @@
+from hashlib import md5
+
+from recipes.models import Recipe
+from recipes.versions import get_version, get_versions
+
+
+def make_etag(*parts):
+    """ETag built from version parts."""
+
+    return md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def versions_with_user_state(user, *keys):
+    """Versions of the keys and of flags of the user, read at once."""
+
+    if user.is_anonymous:
+        return (*get_versions(*keys), 'anonymous')
+    *versions, state = get_versions(*keys, f'user-state:{user.pk}')
+    return (*versions, f'{user.pk}-{state}')
+
+
+def recipe_modified(request, pk):
+    """Modified time of the recipe, fetched once per request."""
+
+    if not hasattr(request, 'recipe_modified'):
+        request.recipe_modified = None
+        if str(pk).isdigit():
+            request.recipe_modified = Recipe.objects.filter(
+                pk=pk).values_list('modified', flat=True).first()
+    return request.recipe_modified
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag of tags and ingredients."""
+
+    return make_etag(
+        get_version('catalog'), request.accepted_renderer.format)
+
+
+def recipe_list_etag(request, *args, **kwargs):
+    """ETag of recipe list pages."""
+
+    return make_etag(
+        *versions_with_user_state(
+            request.user, 'recipes', 'catalog', 'users'),
+        request.accepted_renderer.format,
+    )
+
+
+def recipe_etag(request, pk=None, **kwargs):
+    """ETag of a single recipe."""
+
+    modified = recipe_modified(request, pk)
+    if modified is None:
+        return None
+    return make_etag(
+        pk,
+        modified.isoformat(),
+        *versions_with_user_state(request.user, 'catalog', 'users'),
+        request.accepted_renderer.format,
+    )
+
+
+def recipe_last_modified(request, pk=None, **kwargs):
+    """Last-Modified of a single recipe.
+
+    Only for anonymous users, flags of other users
+    change without touching the recipe.
+    """
+
+    if not request.user.is_anonymous:
+        return None
+    return recipe_modified(request, pk)
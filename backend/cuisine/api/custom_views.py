@@ -3,26 +3,86 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from api.serializers import IsFavoritAndCart
+from api.serializers import BulkRelationSerializer, IsFavoritAndCart
 from recipes.models import Recipe
 
 
 class CuisineSubscriber(APIView):
-    """Custom class for subscription."""
+    """Custom class for subscription.
 
-    def subscribe(self, recipe_id, user_filed):
+    relation is a recipes.relations.UserRelation, rows are added
+    and removed by one statement, the recipe is looked up only
+    for the response or when nothing was removed.
+    """
+
+    def subscribe(self, recipe_id, relation):
         recipe = get_object_or_404(Recipe, pk=recipe_id)
-        if recipe in user_filed.get_queryset():
+        if not relation.add(self.request.user, [recipe.pk]):
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        else:
-            user_filed.add(recipe)
-            serializer = IsFavoritAndCart(recipe)
-            return Response(serializer.data)
+        serializer = IsFavoritAndCart(recipe)
+        return Response(serializer.data)
 
-    def del_subscribe(self, recipe_id, user_filed):
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        if recipe in user_filed.get_queryset():
-            user_filed.remove(recipe)
+    def del_subscribe(self, recipe_id, relation):
+        if relation.remove(self.request.user, [recipe_id]):
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, pk=recipe_id)
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+class BulkRelationView(APIView):
+    """Add, remove or clear many targets of a relation at once.
+
+    Every action is one set-based statement of the relation,
+    the response has a status for every requested id.
+    """
+
+    relation = None
+    statuses = {
+        BulkRelationSerializer.ADD: ('added', 'already_added'),
+        BulkRelationSerializer.REMOVE: ('removed', 'not_added'),
+    }
+
+    def get_excluded_ids(self):
+        """Ids which can't be related to the current user."""
+
+        return set()
+
+    def post(self, request):
+        serializer = BulkRelationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        action = serializer.validated_data['action']
+        if action == BulkRelationSerializer.CLEAR:
+            removed = self.relation.remove(request.user)
+            return Response({'results': [
+                {'id': pk, 'status': 'removed'} for pk in sorted(removed)
+            ]})
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        excluded = self.get_excluded_ids()
+        if action == BulkRelationSerializer.ADD:
+            changed = self.relation.add(
+                request.user, [pk for pk in ids if pk not in excluded])
         else:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+            changed = self.relation.remove(request.user, ids)
+        return Response({'results': self.get_results(
+            ids, changed, excluded, *self.statuses[action])})
+
+    def get_results(self, ids, changed, excluded, changed_status,
+                    unchanged_status):
+        """Status of every requested id."""
+
+        unchanged = [pk for pk in ids if pk not in changed]
+        existing = set(self.relation.target_model.objects.filter(
+            pk__in=unchanged).values_list('pk', flat=True)
+        ) if unchanged else set()
+        results = []
+        for pk in ids:
+            if pk in changed:
+                result_status = changed_status
+            elif pk not in existing:
+                result_status = 'not_found'
+            elif pk in excluded:
+                result_status = 'not_allowed'
+            else:
+                result_status = unchanged_status
+            results.append({'id': pk, 'status': result_status})
+        return results
@@ -0,0 +1,94 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import BaseCache
+
+from recipes.versions import get_versions
+
+
+class RecipeFeedCache:
+    """Cache of recipe list pages for anonymous users.
+
+    Keys contain versions of recipes, users and catalog,
+    so any change of them makes old pages unreachable.
+    """
+
+    prefix = 'recipe-feed'
+    params = (
+        'page', 'cursor', 'limit', 'author', 'ordering', 'search')
+    list_params = ('tags', )
+
+    def normalize(self, query_params):
+        """Query parameters which change the anonymous feed."""
+
+        parts = [
+            f'{param}={query_params.get(param, "")}'
+            for param in self.params
+        ]
+        parts += [
+            f'{param}={",".join(sorted(set(query_params.getlist(param))))}'
+            for param in self.list_params
+        ]
+        return '&'.join(parts)
+
+    def get_key(self, request):
+        """Cache key of the request, None if it isn't cached."""
+
+        page = request.query_params.get('page', '1')
+        if (not page.isdigit()
+                or int(page) > settings.RECIPE_FEED_CACHE_PAGES):
+            return None
+        versions = ':'.join(get_versions('recipes', 'users', 'catalog'))
+        query = md5(
+            f'{request.get_host()}?{self.normalize(request.query_params)}'
+            .encode()
+        ).hexdigest()
+        return f'{self.prefix}:{versions}:{query}'
+
+    def counted(self):
+        """Counters need an atomic incr which keeps the key from expiring.
+
+        incr of memcached does, the generic one of other backends
+        is a get and a set with the default timeout.
+        """
+
+        return type(caches['default']).incr is not BaseCache.incr
+
+    def count(self, counter):
+        """Increase hits or misses counter."""
+
+        if not self.counted():
+            return
+        key = f'{self.prefix}:{counter}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+
+    def get(self, key):
+        """Cached page data or None."""
+
+        data = cache.get(key)
+        self.count('misses' if data is None else 'hits')
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, timeout=settings.RECIPE_FEED_CACHE_TIMEOUT)
+
+    def stats(self):
+        """Returns hits and misses counters."""
+
+        counters = cache.get_many(
+            (f'{self.prefix}:hits', f'{self.prefix}:misses'))
+        return (
+            counters.get(f'{self.prefix}:hits', 0),
+            counters.get(f'{self.prefix}:misses', 0),
+        )
+
+    def reset_stats(self):
+        cache.delete_many((f'{self.prefix}:hits', f'{self.prefix}:misses'))
+
+
+recipe_feed_cache = RecipeFeedCache()
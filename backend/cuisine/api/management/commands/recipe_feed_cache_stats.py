@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.feed_cache import recipe_feed_cache
+
+
+class Command(BaseCommand):
+    help = 'Shows hits and misses of the anonymous recipe feed cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset counters after showing them.',
+        )
+
+    def handle(self, *args, **options):
+        if not recipe_feed_cache.counted():
+            raise CommandError(
+                'Counters are kept only by caches with an atomic incr, '
+                'such as memcached.')
+        hits, misses = recipe_feed_cache.stats()
+        total = hits + misses
+        ratio = hits / total if total else 0
+        self.stdout.write(
+            f'hits: {hits}, misses: {misses}, hit ratio: {ratio:.1%}')
+        if options['reset']:
+            recipe_feed_cache.reset_stats()
+            self.stdout.write('Counters were reset.')
@@ -1,7 +1,113 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageNumberLimitPagination(PageNumberPagination):
     """Custom paginator, rename page_size_query_param to limit."""
 
     page_size_query_param = 'limit'
+
+
+class RecipeFeedPagination(PageNumberLimitPagination):
+    """Page number pagination with opt-in keyset (cursor) mode.
+
+    Cursor mode is used when the cursor query parameter is present,
+    an empty cursor starts from the newest recipe. Pages are selected
+    by (pub_date, id) of the last recipe, without OFFSET and COUNT,
+    so other orderings and ranked search results are paginated
+    only by page numbers.
+    """
+
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+    ordering_query_param = 'ordering'
+    search_query_param = 'search'
+    cursor_ordering_message = (
+        'Cursor pagination is available only for the newest recipes first')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        for param in (self.ordering_query_param, self.search_query_param):
+            if request.query_params.get(param):
+                raise ValidationError({param: [self.cursor_ordering_message]})
+        queryset = queryset.order_by(*self.cursor_ordering)
+
+        def fetch(position, limit):
+            recipes = queryset
+            if position is not None:
+                pub_date, pk = position
+                recipes = recipes.filter(
+                    Q(pub_date__lt=pub_date)
+                    | Q(pub_date=pub_date, pk__lt=pk))
+            return list(recipes[:limit])
+
+        return self.paginate_keyset(request, fetch)
+
+    def paginate_keyset(self, request, fetch):
+        """Cursor page of recipes returned by fetch(position, limit).
+
+        fetch returns at most limit recipes after the (pub_date, id)
+        position, newest first, or from the start if it is None.
+        """
+
+        self.cursor_mode = True
+        self.request = request
+        limit = self.get_page_size(request)
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param))
+        page = fetch(position, limit + 1)
+        self.next_position = None
+        if len(page) > limit:
+            page = page[:limit]
+            self.next_position = (page[-1].pub_date, page[-1].pk)
+        return page
+
+    def encode_cursor(self, position):
+        pub_date, pk = position
+        return urlsafe_b64encode(
+            f'{pub_date.isoformat()}|{pk}'.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Returns (pub_date, id) of the cursor, None for the first page."""
+
+        if not cursor:
+            return None
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                cursor.encode()).decode().split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,64 @@
+from django.db.models import Prefetch, prefetch_related_objects
+
+from recipes.models import RecipeIngredient, Tag
+
+
+class PrefetchPlan:
+    """Declarative description of relations to load eagerly."""
+
+    def __init__(self, select_related=(), prefetch_related=()):
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+
+    def apply(self, queryset):
+        """Add the plan to a queryset."""
+
+        return queryset.select_related(
+            *self.select_related
+        ).prefetch_related(*self.prefetch_related)
+
+    def apply_to_instances(self, instances):
+        """Load the plan for already fetched model instances."""
+
+        prefetch_related_objects(
+            instances, *self.select_related, *self.prefetch_related)
+
+
+RECIPE_PLAN = PrefetchPlan(
+    select_related=('author', ),
+    prefetch_related=(
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch(
+            'recipeingredient_set',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+    ),
+)
+
+
+class PrefetchPlanMixin:
+    """Chooses eager loading by view action.
+
+    prefetch_plans are applied to the view queryset,
+    response_prefetch_plans to the instance returned after a write.
+    """
+
+    prefetch_plans = {}
+    response_prefetch_plans = {}
+
+    def get_queryset(self):
+        """Apply prefetch plan of the current action."""
+
+        queryset = super().get_queryset()
+        plan = self.prefetch_plans.get(self.action)
+        if plan is not None:
+            queryset = plan.apply(queryset)
+        return queryset
+
+    def get_serializer_context(self):
+        """Pass response prefetch plan to the serializer."""
+
+        context = super().get_serializer_context()
+        context['prefetch_plan'] = self.response_prefetch_plans.get(
+            self.action)
+        return context
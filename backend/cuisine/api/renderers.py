@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+import os
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Base renderer for shopping list formats.
+
+    Shopping list rows are streamed by the view with stream(),
+    render() is used only for error responses. The base stream is
+    the text list of describe() lines, other formats override it.
+    """
+
+    def stream(self, ingredients):
+        """Yields chunks of the shopping list."""
+
+        yield 'Shopping list:\n'
+        for ingredient in ingredients:
+            yield self.describe(ingredient) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render error details."""
+
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def describe(ingredient):
+        """Text line of the ingredient, amount is None for "to taste"."""
+
+        line = f'{ingredient["name"]} ({ingredient["measurement_unit"]})'
+        if ingredient['amount'] is None:
+            return line
+        return f'{line} - {ingredient["amount"]}'
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    """Shopping list as plain text."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class Echo:
+    """File-like object which returns the written value."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    """Shopping list as CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'],
+                ingredient['measurement_unit'],
+                ingredient['amount'],
+            ))
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    """Shopping list as JSON array."""
+
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients):
+        separator = ''
+        yield '['
+        for ingredient in ingredients:
+            yield separator + json.dumps({
+                'name': ingredient['name'],
+                'measurement_unit': ingredient['measurement_unit'],
+                'amount': (
+                    None if ingredient['amount'] is None
+                    else str(ingredient['amount'])),
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """Shopping list as PDF document.
+
+    PDF needs byte offsets of every object, so the document is built
+    in a buffer and streamed by chunks.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    chunk_size = 64 * 1024
+    font_size = 12
+    margin = 50
+
+    def get_font(self):
+        """Register unicode font for cyrillic names."""
+
+        font_path = settings.SHOPPING_LIST_FONT
+        if not os.path.exists(font_path):
+            return 'Helvetica'
+        if 'ShoppingListFont' not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont('ShoppingListFont', font_path))
+        return 'ShoppingListFont'
+
+    def stream(self, ingredients):
+        buffer = io.BytesIO()
+        font = self.get_font()
+        document = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        document.setFont(font, self.font_size)
+        line = height - self.margin
+        document.drawString(self.margin, line, 'Shopping list:')
+        for ingredient in ingredients:
+            line -= self.font_size * 1.5
+            if line < self.margin:
+                document.showPage()
+                document.setFont(font, self.font_size)
+                line = height - self.margin
+            document.drawString(
+                self.margin, line, self.describe(ingredient))
+        document.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(self.chunk_size), b'')
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+    PDFShoppingListRenderer,
+)
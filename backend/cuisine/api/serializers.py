@@ -1,9 +1,15 @@
+from django.conf import settings
 from django.db import transaction
 from djoser.serializers import UserSerializer, UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from recipes.models import Tag, Ingredient, Recipe, RecipeIngredient
+from recipes import feed
+from recipes.catalog import catalog
+from recipes.cookable import ingredient_recipe_index
+from recipes.images import variant_urls
+from recipes.models import (
+    Tag, Ingredient, Recipe, RecipeIngredient, SimilarRecipe)
 from users.models import User
 
 
@@ -27,13 +33,19 @@ class SpecialUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, user):
-        """Returns true if user is subscribed."""
+        """Returns true if user is subscribed.
+
+        Subscriptions of the current user are loaded once per request
+        and shared through the serializer context.
+        """
 
         current_user = self.context.get('request').user
-        return (
-            not current_user.is_anonymous
-            and user in current_user.is_subscribed.get_queryset()
-        )
+        if current_user.is_anonymous:
+            return False
+        if 'subscribed_ids' not in self.context:
+            self.context['subscribed_ids'] = set(
+                current_user.is_subscribed.values_list('pk', flat=True))
+        return user.pk in self.context['subscribed_ids']
 
     class Meta:
         model = User
@@ -91,7 +103,31 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ImageVariantsMixin(serializers.Serializer):
+    """Adds URLs of resized recipe images.
+
+    If the image_variant context key names a variant, its JPEG
+    replaces the original image once variants are ready.
+    """
+
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, obj):
+        """Returns URLs of variants, None until they are ready."""
+
+        return variant_urls(obj, self.context.get('request'))
+
+    def to_representation(self, instance):
+        """Replaces the image with the variant of the context."""
+
+        data = super().to_representation(instance)
+        variant = self.context.get('image_variant')
+        if variant and data['image_variants']:
+            data['image'] = data['image_variants'][variant]['jpeg']
+        return data
+
+
+class RecipeSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """Serialazer for geting model Recipe."""
 
     tags = TagSerializer(many=True, )
@@ -103,22 +139,28 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     def get_is_favorited(self, obj):
-        """Returns true if the recipe is in favorites."""
+        """Returns true if the recipe is in favorites.
+
+        Uses the flag annotated by RecipeQuerySet.with_user_flags
+        when it is available.
+        """
 
         user = self.context.get('request').user
-        return (
-            not user.is_anonymous
-            and obj in user.is_favorite.get_queryset()
-        )
+        if user.is_anonymous:
+            return False
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
+        return user.is_favorite.filter(pk=obj.pk).exists()
 
     def get_is_in_shopping_cart(self, obj):
         """Returns true if the recipe is in shopping carts."""
 
         user = self.context.get('request').user
-        return (
-            not user.is_anonymous
-            and obj in user.is_in_shopping_cart.get_queryset()
-        )
+        if user.is_anonymous:
+            return False
+        if hasattr(obj, 'in_shopping_cart'):
+            return obj.in_shopping_cart
+        return user.is_in_shopping_cart.filter(pk=obj.pk).exists()
 
     class Meta:
         model = Recipe
@@ -129,6 +171,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
             'is_favorited',
@@ -144,14 +187,6 @@ class IngredientField(serializers.Serializer):
         max_digits=5, decimal_places=1, min_value=0.01
     )
 
-    def validate(self, data):
-        """Ingredient check"""
-
-        if not Ingredient.objects.filter(pk=data.get('id')).exists():
-            raise serializers.ValidationError(
-                f'This ingredien id={data["id"]} doesn\'t exist')
-        return data
-
 
 class RecipeSerializerSave(serializers.ModelSerializer):
     """Serialazer for creating and updating model Recipe."""
@@ -162,21 +197,46 @@ class RecipeSerializerSave(serializers.ModelSerializer):
     )
     image = Base64ImageField()
 
-    def validate(self, data):
-        """Tags existence and unique ingredients check."""
-        tags = data.get('tags') if 'tags' in data.keys() else []
-        for tag in tags:
-            if not Tag.objects.filter(pk=tag).exists():
-                raise serializers.ValidationError(
-                    f'This tag id={tag} doesn\'t exist')
-        ingrs = data.get('ingredients') if 'ingredients' in data.keys() else []
-        uniq_ingrs = []
-        for ingredient in ingrs:
-            if ingredient.get('id') in uniq_ingrs:
-                raise serializers.ValidationError(
-                    'You have the same ingredients')
-            uniq_ingrs.append(ingredient.get('id'))
-        return data
+    @staticmethod
+    def missing_ids_error(model_name, ids):
+        """Error message listing all missing ids."""
+
+        missing = ', '.join(str(pk) for pk in sorted(ids))
+        return f'{model_name} with id={missing} don\'t exist'
+
+    def validate_tags(self, tag_ids):
+        """Tags existence check, returns Tag objects."""
+
+        tags_by_id = catalog.get().tags_by_id
+        tags = {pk: tags_by_id[pk] for pk in tag_ids if pk in tags_by_id}
+        missing = set(tag_ids) - tags.keys()
+        if missing:
+            raise serializers.ValidationError(
+                self.missing_ids_error('Tags', missing))
+        return list(tags.values())
+
+    def validate_ingredients(self, ingredients):
+        """Unique ingredients and existence check.
+
+        Found Ingredient objects are stored in the ingredient key.
+        """
+
+        ingredient_ids = [ingredient.get('id') for ingredient in ingredients]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'You have the same ingredients')
+        ingredients_by_id = catalog.get().ingredients_by_id
+        found = {
+            pk: ingredients_by_id[pk] for pk in ingredient_ids
+            if pk in ingredients_by_id
+        }
+        missing = set(ingredient_ids) - found.keys()
+        if missing:
+            raise serializers.ValidationError(
+                self.missing_ids_error('Ingredients', missing))
+        for ingredient in ingredients:
+            ingredient['ingredient'] = found[ingredient.get('id')]
+        return ingredients
 
     class Meta:
         model = Recipe
@@ -191,9 +251,65 @@ class RecipeSerializerSave(serializers.ModelSerializer):
 
     def to_representation(self, recipe):
         """Creates response using serializer RecipesSerializer."""
+
+        plan = self.context.get('prefetch_plan')
+        if plan is not None:
+            plan.apply_to_instances([recipe])
         serializer = RecipeSerializer(instance=recipe, context=self.context)
         return serializer.data
 
+    @staticmethod
+    def create_ingredients(recipe, ingredients):
+        """Creates ingredients of a new recipe with one query.
+
+        bulk_create sends no signals, the index of recipes by
+        ingredients is invalidated here if rows were added.
+        """
+
+        if not ingredients:
+            return
+        transaction.on_commit(ingredient_recipe_index.invalidate)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient.get('ingredient'),
+                amount=ingredient.get('amount')
+            )
+            for ingredient in ingredients
+        )
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """Syncs recipe ingredients, touching only changed rows."""
+
+        amounts = {
+            ingredient.get('id'): ingredient.get('amount')
+            for ingredient in ingredients
+        }
+        current = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        removed = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in amounts
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount', ))
+        RecipeSerializerSave.create_ingredients(
+            recipe,
+            [ingredient for ingredient in ingredients
+             if ingredient.get('id') not in current]
+        )
+
     @transaction.atomic
     def create(self, validated_data):
         """Creates record in model Recipes."""
@@ -203,16 +319,8 @@ class RecipeSerializerSave(serializers.ModelSerializer):
         validated_data['author'] = self.context.get('request').user
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-
-        for ingredient in ingredients:
-            current_ingredient = Ingredient.objects.get(
-                pk=ingredient.get('id')
-            )
-            recipe.ingredients.add(
-                current_ingredient,
-                through_defaults={'amount': ingredient.get('amount')}
-            )
-
+        self.create_ingredients(recipe, ingredients)
+        feed.fan_out(recipe)
         return recipe
 
     @transaction.atomic
@@ -227,20 +335,12 @@ class RecipeSerializerSave(serializers.ModelSerializer):
         if 'tags' in validated_data.keys():
             recipe.tags.set(validated_data.pop('tags'))
         if 'ingredients' in validated_data.keys():
-            ingredients = validated_data.pop('ingredients')
-            recipe.ingredients.clear()
-            for ingredient in ingredients:
-                current_ingredient = Ingredient.objects.get(
-                    pk=ingredient.get('id'))
-                recipe.ingredients.add(
-                    current_ingredient,
-                    through_defaults={'amount': ingredient.get('amount')}
-                )
+            self.update_ingredients(recipe, validated_data.pop('ingredients'))
         recipe.save()
         return recipe
 
 
-class IsFavoritAndCart(serializers.ModelSerializer):
+class IsFavoritAndCart(ImageVariantsMixin, serializers.ModelSerializer):
     """Serializer for a recipe in favorite or cart."""
 
     class Meta:
@@ -249,6 +349,7 @@ class IsFavoritAndCart(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         )
 
@@ -259,15 +360,33 @@ class UserSubscriptionSerializer(SpecialUserSerializer):
     recipes = serializers.SerializerMethodField('get_items')
     recipes_count = serializers.IntegerField(read_only=True)
 
-    def get_items(self, user):
-        """Limitation on the number of recipes."""
+    @staticmethod
+    def get_recipes_limit(request):
+        """Returns recipes_limit query parameter or None."""
 
-        recipes_limit = self.context.get('request').query_params.get(
-            'recipes_limit', default='')
-        recipes = user.recipe.all()
+        recipes_limit = request.query_params.get('recipes_limit', default='')
         if recipes_limit.isnumeric() and int(recipes_limit) > 0:
-            recipes = recipes[:int(recipes_limit)]
-        serializer = IsFavoritAndCart(instance=recipes, many=True)
+            return int(recipes_limit)
+        return None
+
+    def get_items(self, user):
+        """Limitation on the number of recipes.
+
+        Uses recipes loaded for the whole page by the view if any.
+        """
+
+        recipes = getattr(user, 'limited_recipes', None)
+        if recipes is None:
+            recipes = user.recipe.all()
+            recipes_limit = self.get_recipes_limit(
+                self.context.get('request'))
+            if recipes_limit:
+                recipes = recipes[:recipes_limit]
+        serializer = IsFavoritAndCart(
+            instance=recipes,
+            many=True,
+            context={'image_variant': self.context.get('image_variant')}
+        )
         return serializer.data
 
     class Meta:
@@ -276,3 +395,64 @@ class UserSubscriptionSerializer(SpecialUserSerializer):
             'recipes',
             'recipes_count',
         )
+
+
+class BulkRelationSerializer(serializers.Serializer):
+    """Serializer for bulk changes of favorites, cart or subscriptions."""
+
+    ADD = 'add'
+    REMOVE = 'remove'
+    CLEAR = 'clear'
+
+    action = serializers.ChoiceField(choices=(ADD, REMOVE, CLEAR))
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=settings.BULK_RELATION_LIMIT,
+    )
+
+    def validate(self, data):
+        """Ids are required to add or remove."""
+
+        if data['action'] != self.CLEAR and not data.get('ids'):
+            raise serializers.ValidationError(
+                {'ids': 'Ids are required to add or remove.'})
+        return data
+
+
+class CookableQuerySerializer(serializers.Serializer):
+    """Serializer for query parameters of "what can I cook" lookup."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.COOKABLE_INGREDIENTS_LIMIT,
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.COOKABLE_RECIPES_LIMIT,
+        default=settings.REST_FRAMEWORK['PAGE_SIZE'],
+    )
+
+
+class CookableRecipeSerializer(serializers.Serializer):
+    """Serializer for a recipe found by available ingredients."""
+
+    recipe = IsFavoritAndCart()
+    coverage = serializers.FloatField()
+    matched = serializers.IntegerField()
+    total = serializers.IntegerField()
+    missing = IngredientSerializer(many=True)
+
+
+class SimilarRecipeSerializer(serializers.ModelSerializer):
+    """Serializer for a precomputed similar recipe."""
+
+    recipe = IsFavoritAndCart(source='similar')
+
+    class Meta:
+        model = SimilarRecipe
+        fields = (
+            'recipe',
+            'score',
+        )
@@ -0,0 +1,139 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.feed_cache import recipe_feed_cache
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+RECIPES_COUNT = 100
+
+# Versions are counted as queries of the database cache
+DATABASE_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'test_cache',
+}}
+
+
+@override_settings(CACHES=DATABASE_CACHES)
+class DatabaseCacheTestCase(TestCase):
+    """Test case with the database cache."""
+
+    def setUp(self):
+        call_command('createcachetable')
+
+
+class CatalogQueriesTest(DatabaseCacheTestCase):
+    """Catalog is served from the process after one version read."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Tag', color='#000000', slug='tag')
+        Ingredient.objects.create(name='Ingredient', measurement_unit='г')
+
+    def test_catalog_queries(self):
+        client = APIClient()
+        client.get('/api/tags/')
+        for url in ('/api/tags/', '/api/ingredients/?name=ingr'):
+            with self.subTest(url), self.assertNumQueries(1):
+                response = client.get(url)
+            self.assertEqual(len(response.data), 1)
+
+
+class RecipeListQueriesTest(DatabaseCacheTestCase):
+    """Recipe list runs a fixed number of queries for any page size.
+
+    Five ORM queries and one read of versions of the ETag.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='First', last_name='Last')
+        tags = [
+            Tag.objects.create(
+                name=f'Tag {i}', color=f'#00000{i}', slug=f'tag-{i}')
+            for i in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ingredient {i}', measurement_unit='г')
+            for i in range(3)
+        ]
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Recipe {i}', text='Text',
+                   image='recipe/image.png', cooking_time=10)
+            for i in range(RECIPES_COUNT))
+        recipes = list(Recipe.objects.all())
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes for ingredient in ingredients)
+
+    def test_list_queries(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get())
+        client.get('/api/recipes/')
+        with self.assertNumQueries(6):
+            response = client.get('/api/recipes/', {'limit': RECIPES_COUNT})
+        self.assertEqual(len(response.data['results']), RECIPES_COUNT)
+
+
+class RecipeFeedCacheTest(DatabaseCacheTestCase):
+    """Pages of anonymous users are served from the cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='First', last_name='Last')
+        Recipe.objects.create(
+            author=author, name='Recipe', text='Text',
+            image='recipe/image.png', cooking_time=10)
+
+    def test_hit_queries(self):
+        client = APIClient()
+        client.get('/api/recipes/')
+        with self.assertNumQueries(2):
+            response = client.get('/api/recipes/')
+        self.assertEqual(len(response.data['results']), 1)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_counters(self):
+        client = APIClient()
+        for _ in range(3):
+            client.get('/api/recipes/')
+        self.assertEqual(recipe_feed_cache.stats(), (2, 1))
+
+
+class RecipeCursorTest(DatabaseCacheTestCase):
+    """Cursor pages keep the newest first order only."""
+
+    def test_ordered_cursor(self):
+        client = APIClient()
+        for params in ({'search': 'soup'}, {'ordering': 'popular'}):
+            with self.subTest(params):
+                response = client.get(
+                    '/api/recipes/', {**params, 'cursor': ''})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.data)
+        response = client.get('/api/recipes/', {'search': 'soup'})
+        self.assertEqual(response.status_code, 200)
+
+
+class SubscriptionsTest(TestCase):
+    """Subscriptions page with limited recipes of the authors."""
+
+    def test_no_subscriptions(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+            first_name='First', last_name='Last'))
+        response = client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
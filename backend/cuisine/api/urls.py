@@ -4,7 +4,7 @@ from rest_framework.routers import DefaultRouter
 from api.views import (
     TagViewSet, IngredientViewSet, RecipeViewSet, AddRemoveFavoriteView,
     AddRemoveCartView, UserSubscription, AddRemoveSubscriptionView,
-    UserShoppingCart)
+    UserShoppingCart, BulkFavoriteView, BulkCartView, BulkSubscriptionView)
 
 app_name = 'api'
 
@@ -27,6 +27,9 @@ urlpatterns = [
         AddRemoveSubscriptionView.as_view()
     ),
     path('users/subscriptions/', UserSubscription.as_view()),
+    path('recipes/favorite/bulk/', BulkFavoriteView.as_view()),
+    path('recipes/shopping_cart/bulk/', BulkCartView.as_view()),
+    path('users/subscriptions/bulk/', BulkSubscriptionView.as_view()),
     path('recipes/download_shopping_cart/', UserShoppingCart.as_view()),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
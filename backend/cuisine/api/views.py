@@ -1,64 +1,202 @@
-from django.http import HttpResponse
-from django.db.models import Count
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, generics
-from rest_framework.permissions import AllowAny
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from api.custom_views import CuisineSubscriber
+from api.conditional import (
+    catalog_etag, recipe_etag, recipe_last_modified, recipe_list_etag)
+from api.custom_views import BulkRelationView, CuisineSubscriber
+from api.feed_cache import recipe_feed_cache
 from api.serializers import (
     TagSerializer, IngredientSerializer, RecipeSerializer,
-    RecipeSerializerSave, UserSubscriptionSerializer)
+    RecipeSerializerSave, UserSubscriptionSerializer,
+    CookableQuerySerializer, CookableRecipeSerializer,
+    SimilarRecipeSerializer)
+from api.paginator import RecipeFeedPagination
 from api.permissions import IsAuthorOrAdmin
-from recipes.customfilters import IngredientFilter
-from recipes.models import Tag, Ingredient, Recipe, RecipeIngredient
+from api.prefetch import RECIPE_PLAN, PrefetchPlanMixin
+from api.renderers import SHOPPING_LIST_RENDERERS
+from recipes.catalog import catalog
+from recipes.cookable import cookable_recipes
+from recipes.feed import feed_page
+from recipes.customfilters import RecipeFilter
+from recipes.models import (
+    Tag, Ingredient, Recipe, RecipeIngredient, SimilarRecipe)
+from recipes.relations import favorites, shopping_cart, subscriptions
 from users.models import User
 
 
-class TagViewSet(ReadOnlyModelViewSet):
-    """Read only view class for Tag model"""
+class CatalogViewSet(ReadOnlyModelViewSet):
+    """Read only view class served from the in-process catalog."""
 
-    serializer_class = TagSerializer
     permission_classes = (AllowAny, )
     pagination_class = None
+    catalog_name = None
+
+    def filter_catalog(self, catalog_data):
+        """Filtered catalog objects, None if there is nothing to filter."""
+
+    @method_decorator(condition(etag_func=catalog_etag))
+    def list(self, request, *args, **kwargs):
+        catalog_data = catalog.get()
+        objects = self.filter_catalog(catalog_data)
+        if objects is None:
+            return Response(catalog_data.serialized(
+                self.catalog_name, self.get_serializer_class()))
+        return Response(self.get_serializer(objects, many=True).data)
+
+    @method_decorator(condition(etag_func=catalog_etag))
+    def retrieve(self, request, *args, **kwargs):
+        objects_by_id = getattr(catalog.get(), f'{self.catalog_name}_by_id')
+        pk = self.kwargs.get('pk')
+        if not pk.isdigit() or int(pk) not in objects_by_id:
+            raise Http404
+        return Response(self.get_serializer(objects_by_id[int(pk)]).data)
+
+
+class TagViewSet(CatalogViewSet):
+    """Read only view class for Tag model"""
+
+    serializer_class = TagSerializer
     queryset = Tag.objects.all()
+    catalog_name = 'tags'
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
-    """Read only view class for Tag model"""
+class IngredientViewSet(CatalogViewSet):
+    """Read only view class for Ingredient model"""
 
     serializer_class = IngredientSerializer
-    permission_classes = (AllowAny, )
-    pagination_class = None
-    filter_backends = (DjangoFilterBackend, )
-    filterset_class = IngredientFilter
     queryset = Ingredient.objects.all()
+    catalog_name = 'ingredients'
+
+    def filter_catalog(self, catalog_data):
+        """Ingredients found by name, case-insensitive.
 
+        Names starting with the query go first, then names containing it.
+        """
 
-class RecipeViewSet(ModelViewSet):
+        name = self.request.query_params.get('name')
+        if not name:
+            return None
+        return catalog_data.ingredient_index.search(name)
+
+
+class RecipeViewSet(PrefetchPlanMixin, ModelViewSet):
     """View class for Recipes model"""
 
     filter_backends = (DjangoFilterBackend, )
     permission_classes = (IsAuthorOrAdmin, )
-    filterset_fields = ('author',)
+    filterset_class = RecipeFilter
+    pagination_class = RecipeFeedPagination
+    queryset = Recipe.objects.all()
+    prefetch_plans = {
+        'list': RECIPE_PLAN,
+        'retrieve': RECIPE_PLAN,
+        'feed': RECIPE_PLAN,
+    }
+    response_prefetch_plans = {
+        'create': RECIPE_PLAN,
+        'partial_update': RECIPE_PLAN,
+    }
 
     def get_queryset(self):
         """Get queryset method."""
 
-        queryset = Recipe.objects.all()
-        tags = self.request.query_params.getlist('tags')
-        is_favorited = self.request.query_params.get('is_favorited')
-        shopping_cart = self.request.query_params.get('is_in_shopping_cart')
-        if is_favorited == '1' and not self.request.user.is_anonymous:
-            queryset = queryset.filter(is_favorite=self.request.user)
-        if shopping_cart == '1' and not self.request.user.is_anonymous:
-            queryset = queryset.filter(is_in_shopping_cart=self.request.user)
-        if tags:
-            queryset = queryset.filter(tags__slug__in=tags).distinct()
-        return queryset
+        return super().get_queryset().with_user_flags(self.request.user)
+
+    @method_decorator(condition(etag_func=recipe_list_etag))
+    def list(self, request, *args, **kwargs):
+        key = None
+        if request.user.is_anonymous:
+            key = recipe_feed_cache.get_key(request)
+        data = recipe_feed_cache.get(key) if key else None
+        if data is not None:
+            response = Response(data)
+        else:
+            response = super().list(request, *args, **kwargs)
+            if key:
+                recipe_feed_cache.set(key, response.data)
+        patch_vary_headers(response, ('Authorization', ))
+        return response
+
+    @method_decorator(condition(
+        etag_func=recipe_etag, last_modified_func=recipe_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        patch_vary_headers(response, ('Authorization', ))
+        return response
+
+    @action(detail=False, permission_classes=(IsAuthenticated, ))
+    def feed(self, request):
+        """New recipes of followed authors, paginated by cursor."""
+
+        def fetch(position, limit):
+            recipe_ids = [
+                recipe_id for pub_date, recipe_id
+                in feed_page(request.user, position, limit)
+            ]
+            recipes = self.get_queryset().in_bulk(recipe_ids)
+            return [
+                recipes[recipe_id] for recipe_id in recipe_ids
+                if recipe_id in recipes
+            ]
+
+        page = self.paginator.paginate_keyset(request, fetch)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=(AllowAny, ))
+    def cookable(self, request):
+        """Recipes ranked by the share of ingredients on hand.
+
+        Ingredients are passed as repeated ingredients parameters.
+        """
+
+        data = {'ingredients': request.query_params.getlist('ingredients')}
+        if 'limit' in request.query_params:
+            data['limit'] = request.query_params['limit']
+        query = CookableQuerySerializer(data=data)
+        query.is_valid(raise_exception=True)
+        recipes = cookable_recipes(
+            query.validated_data['ingredients'],
+            query.validated_data['limit'],
+        )
+        serializer = CookableRecipeSerializer(
+            recipes, many=True, context={'image_variant': 'card'})
+        return Response(serializer.data)
+
+    @action(detail=True, permission_classes=(AllowAny, ))
+    def similar(self, request, pk=None):
+        """Recipes similar by ingredients and tags, read precomputed."""
+
+        try:
+            recipe_id = int(pk)
+        except ValueError:
+            raise Http404
+        rows = SimilarRecipe.objects.filter(
+            recipe=recipe_id).select_related('similar').order_by(
+            '-score', '-similar_id')
+        if not rows and not Recipe.objects.filter(pk=recipe_id).exists():
+            raise Http404
+        serializer = SimilarRecipeSerializer(
+            rows, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    def get_serializer_context(self):
+        """Recipe lists show card sized images."""
+
+        context = super().get_serializer_context()
+        if self.action in ('list', 'feed', 'similar'):
+            context['image_variant'] = 'card'
+        return context
 
     def get_serializer_class(self):
         """Get serializer for different action."""
@@ -77,9 +215,30 @@ class UserSubscription(generics.ListAPIView):
         """Get queryset method."""
 
         user = self.request.user
-        queryset = user.is_subscribed.all().annotate(
-            recipes_count=Count('recipe'))
-        return queryset
+        return user.is_subscribed.all()
+
+    def get_serializer_context(self):
+        """Recipes of authors show card sized images."""
+
+        context = super().get_serializer_context()
+        context['image_variant'] = 'card'
+        return context
+
+    def paginate_queryset(self, queryset):
+        """Loads limited recipes for all authors of the page at once."""
+
+        page = super().paginate_queryset(queryset)
+        if page is None:
+            return page
+        authors = {author.pk: author for author in page}
+        for author in page:
+            author.limited_recipes = []
+        recipes_limit = self.get_serializer_class().get_recipes_limit(
+            self.request)
+        for recipe in Recipe.objects.limited_per_author(
+                authors, recipes_limit):
+            authors[recipe.author_id].limited_recipes.append(recipe)
+        return page
 
 
 class AddRemoveCartView(CuisineSubscriber):
@@ -88,7 +247,7 @@ class AddRemoveCartView(CuisineSubscriber):
     def post(self, request, recipe_id):
         """Check and add recipe to cart."""
 
-        resp = self.subscribe(recipe_id, self.request.user.is_in_shopping_cart)
+        resp = self.subscribe(recipe_id, shopping_cart)
         if resp.status_code == status.HTTP_400_BAD_REQUEST:
             resp.data = {'recipe': f'recipe ID={recipe_id} already in cart'}
         return resp
@@ -96,8 +255,7 @@ class AddRemoveCartView(CuisineSubscriber):
     def delete(self, request, recipe_id):
         """Check and delete recipe to cart."""
 
-        resp = self.del_subscribe(
-            recipe_id, self.request.user.is_in_shopping_cart)
+        resp = self.del_subscribe(recipe_id, shopping_cart)
         if resp.status_code == status.HTTP_400_BAD_REQUEST:
             resp.data = {'recipe': f'recipe ID={recipe_id} not in cart'}
         return resp
@@ -109,7 +267,7 @@ class AddRemoveFavoriteView(CuisineSubscriber):
     def post(self, request, recipe_id):
         """Check and add recipe to favorite."""
 
-        resp = self.subscribe(recipe_id, self.request.user.is_favorite)
+        resp = self.subscribe(recipe_id, favorites)
         if resp.status_code == status.HTTP_400_BAD_REQUEST:
             resp.data = {
                 'recipe': f'recipe ID={recipe_id} already in favorite'}
@@ -118,7 +276,7 @@ class AddRemoveFavoriteView(CuisineSubscriber):
     def delete(self, request, recipe_id):
         """Check and delete recipe to favorite."""
 
-        resp = self.del_subscribe(recipe_id, self.request.user.is_favorite)
+        resp = self.del_subscribe(recipe_id, favorites)
         if resp.status_code == status.HTTP_400_BAD_REQUEST:
             resp.data = {'recipe': f'recipe ID={recipe_id} not in favorite'}
         return resp
@@ -131,63 +289,78 @@ class AddRemoveSubscriptionView(APIView):
         """Check and add user to subscripton."""
 
         sub_user = get_object_or_404(User, pk=user_id)
-        if sub_user in self.request.user.is_subscribed.get_queryset():
+        if sub_user == self.request.user:
             return Response(
-                {'user': f'user ID={user_id} already in subscribed'},
+                {'user': 'Can\'t subscribe yourself'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        elif sub_user == self.request.user:
+        if not subscriptions.add(self.request.user, [sub_user.pk]):
             return Response(
-                {'user': 'Can\'t subscribe yourself'},
+                {'user': f'user ID={user_id} already in subscribed'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        else:
-            self.request.user.is_subscribed.add(sub_user)
-            sub_user.recipes_count = sub_user.recipe.count()
-            serializer = UserSubscriptionSerializer(
-                instance=sub_user,
-                context={'request': request}
-            )
-            return Response(serializer.data)
+        serializer = UserSubscriptionSerializer(
+            instance=sub_user,
+            context={'request': request}
+        )
+        return Response(serializer.data)
 
     def delete(self, request, user_id):
         """Check and delete user to subscripton."""
 
-        sub_user = get_object_or_404(User, pk=user_id)
-        if sub_user in self.request.user.is_subscribed.get_queryset():
-            self.request.user.is_subscribed.remove(sub_user)
+        if subscriptions.remove(self.request.user, [user_id]):
             return Response(status=status.HTTP_204_NO_CONTENT)
-        else:
-            return Response(
-                {'user': f'user ID={user_id} not in subscribed'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        get_object_or_404(User, pk=user_id)
+        return Response(
+            {'user': f'user ID={user_id} not in subscribed'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class BulkFavoriteView(BulkRelationView):
+    """View for bulk changes of favorites."""
+
+    relation = favorites
+
+
+class BulkCartView(BulkRelationView):
+    """View for bulk changes of cart."""
+
+    relation = shopping_cart
+
+
+class BulkSubscriptionView(BulkRelationView):
+    """View for bulk changes of subscriptions."""
+
+    relation = subscriptions
+
+    def get_excluded_ids(self):
+        """Users can't subscribe to themselves."""
+
+        return {self.request.user.pk}
 
 
 class UserShoppingCart(APIView):
-    """View function for list of ingredients"""
+    """View function for list of ingredients.
+
+    Format is chosen with the format query parameter
+    or the Accept header: txt (default), csv, json or pdf.
+    """
+
+    renderer_classes = SHOPPING_LIST_RENDERERS
 
     def get(self, request):
-        shoping_cart = {}
-        for recipe in self.request.user.is_in_shopping_cart.get_queryset():
-            for ingredient in RecipeIngredient.objects.filter(recipe=recipe):
-                name = ingredient.ingredient.name
-                measurement_unit = ingredient.ingredient.measurement_unit
-                amount = ingredient.amount
-                if name in shoping_cart.keys():
-                    shoping_cart[name]['amount'] += amount
-                else:
-                    shoping_cart[name] = {
-                        'amount': amount,
-                        'unit': measurement_unit
-                    }
-        shopping_list = 'Shopping list:\n'
-        for ingr in shoping_cart:
-            shopping_list += (f'{ingr} ({shoping_cart[ingr]["unit"]})'
-                              f' - {shoping_cart[ingr]["amount"]}\n')
-        response = HttpResponse(
-            shopping_list,
-            content_type='text/plain;charset=UTF-8'
+        ingredients = RecipeIngredient.objects.filter(
+            recipe__is_in_shopping_cart=self.request.user
+        ).shopping_list()
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f';charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=content_type
         )
-        response['Content-Disposition'] = 'attachment'
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"')
         return response
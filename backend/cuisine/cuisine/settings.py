@@ -100,6 +100,88 @@ DATABASES = {
 }
 
 
+# Cache
+# Versions of in-process caches are kept here, they have to be shared by
+# gunicorn workers and management commands. Memcached keeps them in memory,
+# requests of the catalog don't go to the database.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.memcached.MemcachedCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='localhost:11211'),
+    }
+}
+
+
+# Anonymous recipe feed cache: number of first pages and timeout in seconds
+
+RECIPE_FEED_CACHE_PAGES = 5
+RECIPE_FEED_CACHE_TIMEOUT = 300
+
+
+# Maximum number of ingredients returned by name search
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+
+# Recipe scores: weights of counters and trending score half-life in hours
+
+RECIPE_SCORE_WEIGHTS = {
+    'favorites_count': 2,
+    'in_carts_count': 1,
+}
+RECIPE_TRENDING_HALF_LIFE = 24
+
+
+# Maximum number of ids in one bulk favorites, cart or subscriptions request
+
+BULK_RELATION_LIMIT = 500
+
+
+# Background tasks run by a thread pool of every process
+
+BACKGROUND_TASK_WORKERS = int(os.getenv('BACKGROUND_TASK_WORKERS', 2))
+
+
+# Resized recipe images: maximum sizes of variants and JPEG/WebP quality
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_VARIANTS_DIR = 'recipe/variants'
+
+
+# Text search configuration of the recipe full text search
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+
+# Maximum number of recipes and ingredients of "what can I cook" lookup
+
+COOKABLE_RECIPES_LIMIT = 50
+COOKABLE_INGREDIENTS_LIMIT = 100
+
+
+# Home feed: authors with more followers are read on request,
+# number of latest recipes added to the feed on subscription
+
+FEED_FAN_OUT_LIMIT = 10000
+FEED_BACKFILL_LIMIT = 50
+
+
+# Similar recipes: number of stored neighbors of a recipe and the share
+# of tag overlap in their score, the rest is ingredient overlap
+
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_TAG_WEIGHT = 0.3
+
+
 # User model settings
 
 AUTH_USER_MODEL = 'users.User'
@@ -171,3 +253,11 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+
+# Shopping list export
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
@@ -56,7 +56,6 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline, )
 
     def count_subscribers(self, obj):
-        count = obj.is_favorite.count()
-        return format_html('{} subscribers', count)
+        return format_html('{} subscribers', obj.favorites_count)
 
-    readonly_fields = ('count_subscribers', )
+    readonly_fields = ('count_subscribers', 'in_carts_count', )
@@ -0,0 +1,67 @@
+from bisect import bisect_left
+
+from django.conf import settings
+
+from recipes.models import Ingredient, Tag
+from recipes.versions import VersionedCache
+
+
+def normalize(name):
+    """Case-insensitive form of a name, ё is searched as е."""
+
+    return name.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Sorted index of ingredient names for typeahead search."""
+
+    def __init__(self, ingredients):
+        self.entries = sorted(
+            ((normalize(ingredient.name), ingredient)
+             for ingredient in ingredients),
+            key=lambda entry: (entry[0], entry[1].measurement_unit)
+        )
+        self.keys = [key for key, ingredient in self.entries]
+
+    def search(self, query, limit=None):
+        """Prefix matches first, then substring matches."""
+
+        query = normalize(query)
+        limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+        found = []
+        position = bisect_left(self.keys, query)
+        while (position < len(self.keys) and len(found) < limit
+               and self.keys[position].startswith(query)):
+            found.append(self.entries[position][1])
+            position += 1
+        for key, ingredient in self.entries:
+            if len(found) >= limit:
+                break
+            if query in key and not key.startswith(query):
+                found.append(ingredient)
+        return found
+
+
+class Catalog:
+    """Snapshot of all tags and ingredients."""
+
+    def __init__(self):
+        self.tags = list(Tag.objects.all())
+        self.ingredients = list(Ingredient.objects.all())
+        self.tags_by_id = {tag.pk: tag for tag in self.tags}
+        self.ingredients_by_id = {
+            ingredient.pk: ingredient for ingredient in self.ingredients
+        }
+        self.ingredient_index = IngredientIndex(self.ingredients)
+        self.serialized_data = {}
+
+    def serialized(self, name, serializer_class):
+        """Returns serialized tags or ingredients, built once."""
+
+        if name not in self.serialized_data:
+            self.serialized_data[name] = serializer_class(
+                getattr(self, name), many=True).data
+        return self.serialized_data[name]
+
+
+catalog = VersionedCache('catalog', Catalog)
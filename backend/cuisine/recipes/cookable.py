@@ -0,0 +1,100 @@
+from collections import defaultdict, namedtuple
+from itertools import chain
+
+import numpy as np
+
+from recipes.catalog import catalog
+from recipes.models import Recipe, RecipeIngredient
+from recipes.versions import BackgroundVersionedCache
+
+CookableRecipe = namedtuple(
+    'CookableRecipe', ('recipe', 'coverage', 'matched', 'total', 'missing'))
+
+
+class IngredientRecipeIndex:
+    """Inverted index from ingredients to recipes using them.
+
+    Recipes are numbered densely, every ingredient keeps a numpy
+    array of recipe numbers, so a lookup counts matches with one
+    bincount instead of reading RecipeIngredient rows.
+    """
+
+    def __init__(self):
+        rows = RecipeIngredient.objects.order_by().values_list(
+            'ingredient_id', 'recipe_id')
+        pairs = np.fromiter(
+            chain.from_iterable(rows.iterator()), dtype=np.int64
+        ).reshape(-1, 2)
+        self.recipe_ids, positions = np.unique(
+            pairs[:, 1], return_inverse=True)
+        positions = positions.reshape(-1).astype(np.int32)
+        self.sizes = np.bincount(positions, minlength=len(self.recipe_ids))
+        order = np.argsort(pairs[:, 0], kind='stable')
+        ingredient_ids, starts = np.unique(
+            pairs[order, 0], return_index=True)
+        self.postings = dict(zip(
+            ingredient_ids.tolist(),
+            np.split(positions[order], starts[1:]),
+        ))
+
+    def match(self, ingredient_ids, limit):
+        """Best covered recipes as (recipe_id, matched, total).
+
+        Recipes are ordered by the share of their ingredients
+        which are available, then by number of matches. All recipes
+        tied with the last one by the share are sorted before the
+        cut, so the result doesn't depend on the limit.
+        """
+
+        arrays = [
+            self.postings[pk] for pk in set(ingredient_ids)
+            if pk in self.postings
+        ]
+        if not arrays:
+            return []
+        counts = np.bincount(
+            np.concatenate(arrays), minlength=len(self.recipe_ids))
+        candidates = np.flatnonzero(counts)
+        coverage = counts[candidates] / self.sizes[candidates]
+        if len(candidates) > limit:
+            threshold = -np.partition(-coverage, limit - 1)[limit - 1]
+            best = coverage >= threshold
+            candidates, coverage = candidates[best], coverage[best]
+        order = np.lexsort((
+            -self.recipe_ids[candidates], -counts[candidates], -coverage
+        ))[:limit]
+        return [
+            (int(self.recipe_ids[position]), int(counts[position]),
+             int(self.sizes[position]))
+            for position in candidates[order]
+        ]
+
+
+ingredient_recipe_index = BackgroundVersionedCache(
+    'recipe-ingredients', IngredientRecipeIndex)
+
+
+def cookable_recipes(ingredient_ids, limit):
+    """Recipes which can be cooked from the ingredients.
+
+    Returns CookableRecipe tuples with lists of missing ingredients.
+    """
+
+    matches = ingredient_recipe_index.get().match(ingredient_ids, limit)
+    recipe_ids = [recipe_id for recipe_id, matched, total in matches]
+    recipes = Recipe.objects.in_bulk(recipe_ids)
+    ingredients_by_id = catalog.get().ingredients_by_id
+    available = set(ingredient_ids)
+    missing = defaultdict(list)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe__in=recipe_ids).values_list('recipe_id', 'ingredient_id'):
+        if (ingredient_id not in available
+                and ingredient_id in ingredients_by_id):
+            missing[recipe_id].append(ingredients_by_id[ingredient_id])
+    return [
+        CookableRecipe(
+            recipes[recipe_id], matched / total, matched, total,
+            missing[recipe_id])
+        for recipe_id, matched, total in matches
+        if recipe_id in recipes
+    ]
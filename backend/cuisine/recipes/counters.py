@@ -0,0 +1,61 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Recipe
+from users.models import User
+
+RECIPE_COUNTERS = {
+    User.is_favorite.through: 'favorites_count',
+    User.is_in_shopping_cart.through: 'in_carts_count',
+}
+
+
+def change_counters(model, field, deltas):
+    """Add deltas {pk: delta} to a counter column.
+
+    Rows with the same delta are updated by one UPDATE with F(),
+    a counter never goes below zero.
+    """
+
+    pks_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            pks_by_delta[delta].append(pk)
+    for delta, pks in pks_by_delta.items():
+        value = F(field) + delta
+        if delta < 0:
+            value = Greatest(value, Value(0))
+        model.objects.filter(pk__in=pks).update(**{field: value})
+
+
+def change_recipe_counter(through, rows, delta):
+    """Change counter of recipes referenced by through table rows."""
+
+    recipe_ids = Counter(rows.values_list('recipe_id', flat=True))
+    change_counters(Recipe, RECIPE_COUNTERS[through], {
+        recipe_id: count * delta for recipe_id, count in recipe_ids.items()
+    })
+
+
+def count_subquery(queryset, field):
+    """Number of rows of the queryset per value of the field."""
+
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(
+            count=Count('pk')).values('count')
+    ), 0)
+
+
+def expected_counters():
+    """Counter columns with the subqueries computing their values."""
+
+    counters = [
+        (User, 'recipes_count', count_subquery(
+            Recipe.objects.filter(author=OuterRef('pk')), 'author')),
+    ]
+    for through, field in RECIPE_COUNTERS.items():
+        counters.append((Recipe, field, count_subquery(
+            through.objects.filter(recipe=OuterRef('pk')), 'recipe')))
+    return counters
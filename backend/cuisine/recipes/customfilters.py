@@ -1,13 +1,82 @@
-import django_filters
+from django.db.models import Exists, OuterRef
+from django_filters import rest_framework as filters
 
-from .models import Ingredient
+from recipes.catalog import catalog
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from users.models import User
 
 
-class IngredientFilter(django_filters.FilterSet):
-    """Filter for Recipe by fields: name."""
+class RecipeFilter(filters.FilterSet):
+    """Filter for Recipe by fields: tags, author, favorites and cart.
 
-    name = django_filters.CharFilter(lookup_expr='startswith')
+    Relations are checked with EXISTS subqueries,
+    so recipes never need DISTINCT. Search results are ranked,
+    an explicit popular or trending ordering takes precedence.
+    Popular and trending orderings use scores precomputed
+    by the update_recipe_scores command.
+    """
+
+    ORDERINGS = {
+        'popular': ('-popularity_score', '-id'),
+        'trending': ('-trending_score', '-id'),
+    }
+
+    tags = filters.CharFilter(method='filter_tags')
+    author = filters.NumberFilter(field_name='author')
+    is_favorited = filters.BooleanFilter(method='filter_is_favorited')
+    is_in_shopping_cart = filters.BooleanFilter(
+        method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in ORDERINGS],
+        method='filter_ordering',
+    )
 
     class Meta:
-        model = Ingredient
-        fields = ('name', )
+        model = Recipe
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+            'search', 'ordering',
+        )
+
+    def filter_tags(self, queryset, name, value):
+        """Recipes with any of tags, given by slugs."""
+
+        slugs = set(self.data.getlist(name))
+        tag_ids = [
+            tag.pk for tag in catalog.get().tags if tag.slug in slugs
+        ]
+        return queryset.annotate(
+            has_tags=Exists(Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__in=tag_ids))
+        ).filter(has_tags=True)
+
+    def filter_user_relation(self, queryset, name, through, value):
+        """Recipes related to the current user through the table."""
+
+        user = self.request.user
+        if not value or user.is_anonymous:
+            return queryset
+        return queryset.annotate(**{
+            f'{name}_exists': Exists(through.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+        }).filter(**{f'{name}_exists': True})
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_user_relation(
+            queryset, name, User.is_favorite.through, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_user_relation(
+            queryset, name, User.is_in_shopping_cart.through, value)
+
+    def filter_search(self, queryset, name, value):
+        """Full text search over name, ingredients and text."""
+
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*self.ORDERINGS[value])
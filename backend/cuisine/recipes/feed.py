@@ -0,0 +1,113 @@
+from heapq import merge
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from recipes.models import FeedEntry, Recipe
+from users.models import User
+
+Subscription = User.is_subscribed.through
+
+
+def fan_out(recipe):
+    """Adds the new recipe to feeds of followers of the author.
+
+    Authors with more than FEED_FAN_OUT_LIMIT followers are switched
+    to fan-out on read, their recipes are merged into feeds on read.
+    """
+
+    author = recipe.author
+    if author.fan_out_on_read:
+        return
+    limit = settings.FEED_FAN_OUT_LIMIT
+    followers = Subscription.objects.filter(to_user=author)
+    if followers[:limit + 1].count() > limit:
+        User.objects.filter(pk=author.pk).update(fan_out_on_read=True)
+        author.fan_out_on_read = True
+        return
+    quote = connection.ops.quote_name
+    pub_date = connection.ops.adapt_datetimefield_value(recipe.pub_date)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(FeedEntry._meta.db_table)} '
+            f'(user_id, recipe_id, author_id, pub_date) '
+            f'SELECT from_user_id, %s, %s, %s '
+            f'FROM {quote(Subscription._meta.db_table)} '
+            f'WHERE to_user_id = %s '
+            f'ON CONFLICT DO NOTHING',
+            (recipe.pk, author.pk, pub_date, author.pk)
+        )
+
+
+def backfill(user_ids, author_ids):
+    """Adds latest recipes of newly followed authors to the feeds."""
+
+    author_ids = list(User.objects.filter(
+        pk__in=author_ids, fan_out_on_read=False
+    ).values_list('pk', flat=True))
+    if not author_ids:
+        return
+    recipes = list(Recipe.objects.limited_per_author(
+        author_ids, settings.FEED_BACKFILL_LIMIT))
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe.pk,
+                author_id=recipe.author_id,
+                pub_date=recipe.pub_date,
+            )
+            for user_id in user_ids for recipe in recipes
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def remove(user_ids=None, author_ids=None):
+    """Removes recipes of unfollowed authors from the feeds.
+
+    None means all users or all authors.
+    """
+
+    entries = FeedEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user__in=user_ids)
+    if author_ids is not None:
+        entries = entries.filter(author__in=author_ids)
+    entries.delete()
+
+
+def keyset(queryset, position, pk_field):
+    """Rows after the (pub_date, id) position, newest first."""
+
+    if position is not None:
+        pub_date, pk = position
+        queryset = queryset.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, **{f'{pk_field}__lt': pk}))
+    return queryset.order_by('-pub_date', f'-{pk_field}').values_list(
+        'pub_date', pk_field)
+
+
+def feed_page(user, position, limit):
+    """(pub_date, recipe_id) of the home feed after the position.
+
+    Feed entries and recipes of followed fan-out on read authors
+    are both read by their indexes and merged.
+    """
+
+    entries = keyset(
+        FeedEntry.objects.filter(user=user), position, 'recipe_id')[:limit]
+    pulled = keyset(
+        Recipe.objects.filter(author__in=user.is_subscribed.filter(
+            fan_out_on_read=True).values('pk')),
+        position, 'id')[:limit]
+    page = []
+    for row in merge(entries, pulled, reverse=True):
+        if page and page[-1] == row:
+            continue
+        page.append(row)
+        if len(page) == limit:
+            break
+    return page
@@ -0,0 +1,78 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+from recipes.versions import bump_version
+
+FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+
+def variant_name(image_name, variant, extension):
+    """Storage name of the image variant."""
+
+    return (f'{settings.RECIPE_IMAGE_VARIANTS_DIR}/'
+            f'{os.path.basename(image_name)}/{variant}.{extension}')
+
+
+def open_image(image_name):
+    """Image from the storage, rotated by EXIF, without transparency."""
+
+    with default_storage.open(image_name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_variants(recipe_id, image_name):
+    """Saves resized variants of the recipe image in every format.
+
+    Variants are marked ready only if the recipe still has the image.
+    """
+
+    image = open_image(image_name)
+    for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        for extension, image_format in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(
+                buffer, image_format, quality=settings.RECIPE_IMAGE_QUALITY)
+            name = variant_name(image_name, variant, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        variants_of=image_name, modified=timezone.now())
+    if updated:
+        bump_version('recipes')
+
+
+def variant_urls(recipe, request=None):
+    """URLs of image variants by size and format, None if not ready."""
+
+    if not recipe.image or recipe.variants_of != recipe.image.name:
+        return None
+    urls = {}
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        urls[variant] = {}
+        for extension in FORMATS:
+            url = default_storage.url(
+                variant_name(recipe.image.name, variant, extension))
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[variant][extension] = url
+    return urls
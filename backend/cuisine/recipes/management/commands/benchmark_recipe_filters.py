@@ -0,0 +1,108 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+
+from recipes.customfilters import RecipeFilter
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Compares plans and latency of DISTINCT and EXISTS '
+            'tag filtering of the recipe feed.')
+    batch_size = 5000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Create benchmark recipes until there are at least N.',
+        )
+        parser.add_argument(
+            '--tags',
+            nargs='+',
+            help='Tag slugs to filter by, two first tags by default.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def seed(self, total):
+        """Bulk creates recipes with random tags."""
+
+        missing = total - Recipe.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(
+            username='benchmark',
+            defaults={'email': 'benchmark@example.com'}
+        )
+        tags = list(Tag.objects.all())
+        if not tags:
+            tags = [
+                Tag.objects.create(
+                    name=f'benchmark {number}',
+                    color=f'#00000{number}',
+                    slug=f'benchmark-{number}'
+                )
+                for number in range(3)
+            ]
+        generator = random.Random(total)
+        for start in range(0, missing, self.batch_size):
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=f'benchmark recipe {start + number}',
+                    text='benchmark',
+                    image='recipe/benchmark.png',
+                    cooking_time=generator.randint(1, 120),
+                )
+                for number in range(min(self.batch_size, missing - start))
+            )
+            untagged = Recipe.objects.filter(
+                author=author, tags__isnull=True).values_list('pk', flat=True)
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.pk)
+                for recipe_id in untagged
+                for tag in generator.sample(
+                    tags, generator.randint(1, min(2, len(tags))))
+            )
+        self.stdout.write(f'Seeded {missing} recipes.')
+
+    def measure(self, title, queryset, repeat, limit):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            list(queryset[:limit])
+            queryset.count()
+            timings.append((perf_counter() - start) * 1000)
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(queryset[:limit].explain())
+        self.stdout.write(
+            f'best {min(timings):.1f} ms, '
+            f'mean {sum(timings) / len(timings):.1f} ms\n'
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        slugs = options['tags'] or list(
+            Tag.objects.values_list('slug', flat=True)[:2])
+        data = QueryDict(mutable=True)
+        data.setlist('tags', slugs)
+        self.stdout.write(
+            f'{Recipe.objects.count()} recipes, tags: {", ".join(slugs)}\n')
+        self.measure(
+            'DISTINCT join',
+            Recipe.objects.filter(tags__slug__in=slugs).distinct(),
+            options['repeat'],
+            options['limit'],
+        )
+        self.measure(
+            'EXISTS subquery',
+            RecipeFilter(data, queryset=Recipe.objects.all()).qs,
+            options['repeat'],
+            options['limit'],
+        )
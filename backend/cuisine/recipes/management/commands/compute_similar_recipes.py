@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.similar import RecipeSimilarity, compute_similar
+
+
+class Command(BaseCommand):
+    help = ('Computes similar recipes of every recipe by ingredients '
+            'and tags. Saved recipes are refreshed on their own, run it '
+            'after imports and periodically to refresh the rest.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Recipes compared with all others at once.',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive.')
+        similarity = RecipeSimilarity()
+        stored = compute_similar(
+            similarity, settings.SIMILAR_RECIPES_COUNT,
+            options['chunk_size'])
+        self.stdout.write(
+            f'{stored} similar recipes stored for '
+            f'{len(similarity.recipe_ids)} recipes.')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Generates resized image variants of recipes which '
+            "don't have them yet, e.g. uploaded before the pipeline.")
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(
+            image='').exclude(variants_of=F('image')).values_list(
+            'pk', 'image')
+        done = failed = 0
+        for pk, image in recipes.iterator():
+            try:
+                generate_variants(pk, image)
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f'Recipe {pk}: {error}')
+            else:
+                done += 1
+        self.stdout.write(
+            f'Variants generated for {done} recipes, {failed} failed.')
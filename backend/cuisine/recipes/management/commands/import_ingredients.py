@@ -0,0 +1,129 @@
+import csv
+import json
+import os
+from itertools import islice
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.catalog import catalog
+from recipes.models import Ingredient
+
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+
+
+def read_csv(file):
+    """Rows of name,measurement_unit CSV, header is optional."""
+
+    for row in csv.reader(file):
+        if len(row) < 2 or row[:2] == ['name', 'measurement_unit']:
+            continue
+        yield row[0], row[1]
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    """Objects of a top level JSON array, read by chunks."""
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in iter(lambda: file.read(chunk_size), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('JSON file must contain an array.')
+                started = True
+                position += 1
+                continue
+            if position >= len(buffer) or buffer[position] == ']':
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+        buffer = buffer[position:]
+    if buffer.strip() not in ('', ']'):
+        raise CommandError('Invalid JSON array.')
+
+
+def read_json(file):
+    """Rows of a JSON array of ingredients or of a loaddata fixture."""
+
+    for item in iter_json_array(file):
+        fields = item.get('fields', item)
+        yield fields.get('name', ''), fields.get('measurement_unit', '')
+
+
+class Command(BaseCommand):
+    help = ('Imports ingredients from CSV or JSON with batched inserts, '
+            'existing ingredients are skipped.')
+    readers = {
+        '.csv': read_csv,
+        '.json': read_json,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file.')
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'json'),
+            help='File format, by extension of the path by default.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def get_reader(self, options):
+        extension = (
+            f'.{options["format"]}' if options['format']
+            else os.path.splitext(options['path'])[1].lower()
+        )
+        if extension not in self.readers:
+            raise CommandError(f'Unknown format of {options["path"]}.')
+        return self.readers[extension]
+
+    def clean(self, rows):
+        """Valid unique rows, invalid ones are counted."""
+
+        self.invalid = 0
+        for name, unit in rows:
+            name, unit = name.strip(), unit.strip()
+            if (not name or not unit or len(name) > NAME_LENGTH
+                    or len(unit) > UNIT_LENGTH):
+                self.invalid += 1
+                continue
+            yield name, unit
+
+    def handle(self, *args, **options):
+        reader = self.get_reader(options)
+        batch_size = options['batch_size']
+        before = Ingredient.objects.count()
+        started = perf_counter()
+        read = 0
+        with open(options['path'], encoding='utf-8', newline='') as file:
+            rows = self.clean(reader(file))
+            while True:
+                batch = dict.fromkeys(islice(rows, batch_size))
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(
+                    (Ingredient(name=name, measurement_unit=unit)
+                     for name, unit in batch),
+                    ignore_conflicts=True,
+                )
+                read += len(batch)
+                self.stdout.write(f'{read} rows imported...', ending='\r')
+        elapsed = perf_counter() - started
+        created = Ingredient.objects.count() - before
+        if created:
+            catalog.invalidate()
+        self.stdout.write(
+            f'Read {read} rows in {elapsed:.2f}s '
+            f'({read / elapsed if elapsed else 0:.0f} rows/s): '
+            f'{created} created, {read - created} duplicates skipped, '
+            f'{self.invalid} invalid.'
+        )
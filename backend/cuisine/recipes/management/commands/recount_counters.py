@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import expected_counters
+from recipes.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = ('Recomputes favorites, shopping cart and author recipes '
+            'counters to repair drift.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report rows with wrong counters.',
+        )
+
+    def handle(self, *args, **options):
+        repaired = 0
+        for model, field, expected in expected_counters():
+            with transaction.atomic():
+                drifted = model.objects.annotate(
+                    expected=expected).exclude(**{field: F('expected')})
+                count = drifted.count()
+                self.stdout.write(
+                    f'{model.__name__}.{field}: {count} wrong rows')
+                if count and not options['dry_run']:
+                    model.objects.update(**{field: expected})
+                    repaired += count
+        if repaired:
+            bump_version('recipes')
+            bump_version('users')
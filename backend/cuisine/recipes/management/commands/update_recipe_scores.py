@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.scores import elapsed_decay, update_scores
+from recipes.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = ('Updates popularity and trending scores of recipes. '
+            'Run it periodically, trending scores decay by the time '
+            'since the previous run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--half-life',
+            type=float,
+            help='Hours for trending score to halve.',
+        )
+
+    def handle(self, *args, **options):
+        if options['half_life'] is not None and options['half_life'] <= 0:
+            raise CommandError('--half-life must be positive.')
+        with transaction.atomic():
+            updated = update_scores(elapsed_decay(options['half_life']))
+        if updated:
+            bump_version('recipes')
+        self.stdout.write(f'Scores of {updated} recipes were updated.')
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(
+            count=Count('pk')).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    User.objects.update(recipes_count=count_subquery(
+        Recipe.objects.filter(author=OuterRef('pk')), 'author'))
+    Recipe.objects.update(
+        favorites_count=count_subquery(
+            User.is_favorite.through.objects.filter(recipe=OuterRef('pk')),
+            'recipe'),
+        in_carts_count=count_subquery(
+            User.is_in_shopping_cart.through.objects.filter(
+                recipe=OuterRef('pk')),
+            'recipe'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_hot_lookup_indexes'),
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Added to favorites'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Added to shopping carts'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
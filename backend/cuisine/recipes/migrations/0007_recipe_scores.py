@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Popularity score'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='scored_activity',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Favorites and cart additions at the last scoring'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Trending score'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity_score', '-id'], name='recipe_popularity_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipe_trending_id_idx'),
+        ),
+    ]
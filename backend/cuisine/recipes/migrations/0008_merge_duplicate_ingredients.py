@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:12
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+MAX_AMOUNT = Decimal('9999.9')
+
+
+def merge_duplicates(apps, schema_editor):
+    """Moves recipe rows of duplicate ingredients to the oldest one."""
+
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(kept=Min('pk'), total=Count('pk')).filter(total__gt=1)
+    for duplicate in duplicates:
+        kept = duplicate['kept']
+        others = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(pk=kept)
+        for row in RecipeIngredient.objects.filter(ingredient__in=others):
+            existing = RecipeIngredient.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=kept).first()
+            if existing is None:
+                row.ingredient_id = kept
+                row.save(update_fields=('ingredient', ))
+            else:
+                existing.amount = min(existing.amount + row.amount,
+                                      MAX_AMOUNT)
+                existing.save(update_fields=('amount', ))
+                row.delete()
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_ingredient_name_unit_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='variants_of',
+            field=models.CharField(blank=True, editable=False, help_text='Image which resized variants are ready for', max_length=100),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:19
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+FILL_SEARCH_VECTORS = '''
+UPDATE recipes_recipe recipe SET search_vector =
+    setweight(to_tsvector(%(config)s, recipe.name), 'A')
+    || setweight(to_tsvector(%(config)s, coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient recipe_ingredient
+        JOIN recipes_ingredient ingredient
+            ON ingredient.id = recipe_ingredient.ingredient_id
+        WHERE recipe_ingredient.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%(config)s, recipe.text), 'C')
+'''
+
+
+def create_search_index(apps, schema_editor):
+    """GIN index and initial vectors, tsvector exists only on Postgres."""
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX recipe_search_vector_idx ON recipes_recipe '
+        'USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        FILL_SEARCH_VECTORS, {'config': settings.RECIPE_SEARCH_CONFIG})
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_variants_of'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Full text search document, has a GIN index on Postgres', null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+MAX_AMOUNT = Decimal('9999.9')
+
+
+def merge_duplicates(apps, schema_editor):
+    """Sums amounts of repeated ingredients of a recipe into the oldest row."""
+
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = RecipeIngredient.objects.order_by().values(
+        'recipe', 'ingredient'
+    ).annotate(kept=Min('pk'), total=Count('pk')).filter(total__gt=1)
+    for duplicate in duplicates:
+        rows = RecipeIngredient.objects.filter(
+            recipe_id=duplicate['recipe'],
+            ingredient_id=duplicate['ingredient'],
+        )
+        kept = rows.get(pk=duplicate['kept'])
+        others = rows.exclude(pk=kept.pk)
+        for row in others:
+            kept.amount = min(kept.amount + row.amount, MAX_AMOUNT)
+        kept.save(update_fields=('amount', ))
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_similar_recipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'recipe'), name='recipe_ingr_unique'),
+        ),
+    ]
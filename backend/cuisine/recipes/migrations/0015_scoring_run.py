@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoringRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,8 +1,59 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (
     MaxValueValidator, MinValueValidator, RegexValidator)
 from django.db import models
+from django.db.models import (
+    BooleanField, Case, Exists, F, Max, Min, OuterRef, Q, Sum, Value, When,
+    Window)
+from django.db.models.functions import RowNumber
 
-from users.models import User
+from recipes.units import (
+    AMOUNT_FIELD, NON_SUMMABLE_UNITS, base_factor, base_unit)
+from users.models import User, saved_fields
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Queryset for Recipe model."""
+
+    def with_user_flags(self, user):
+        """Annotate favorite and shopping cart flags for the user."""
+
+        if user.is_anonymous:
+            return self.annotate(
+                favorited=Value(False, output_field=BooleanField()),
+                in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            favorited=Exists(User.is_favorite.through.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            in_shopping_cart=Exists(
+                User.is_in_shopping_cart.through.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+        )
+
+    def limited_per_author(self, author_ids, limit=None):
+        """Newest recipes of the authors, at most limit for each one.
+
+        ROW_NUMBER() over recipes of every author selects them
+        with a single query.
+        """
+
+        author_ids = list(author_ids)
+        if not author_ids:
+            return self.none()
+        queryset = self.filter(author__in=author_ids)
+        if limit is None:
+            return queryset
+        sql, params = queryset.annotate(author_rank=Window(
+            expression=RowNumber(),
+            partition_by=(F('author'), ),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )).order_by().query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE ranked.author_rank <= %s '
+            f'ORDER BY ranked.author_id, ranked.author_rank',
+            (*params, limit)
+        )
 
 
 class Recipe(models.Model):
@@ -38,13 +89,84 @@ class Recipe(models.Model):
         )
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Added to favorites',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Added to shopping carts',
+    )
+    popularity_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Popularity score',
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Trending score',
+    )
+    scored_activity = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text='Favorites and cart additions at the last scoring',
+    )
+    variants_of = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        help_text='Image which resized variants are ready for',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text='Full text search document, has a GIN index on Postgres',
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    maintained_fields = (
+        'favorites_count', 'in_carts_count',
+        'popularity_score', 'trending_score', 'scored_activity',
+        'variants_of', 'search_vector',
+    )
 
     class Meta:
-        ordering = ('-pub_date', )
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('-popularity_score', '-id'),
+                name='recipe_popularity_id_idx'
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_id_idx'
+            ),
+        )
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Maintained columns are changed only with queryset updates."""
+
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = saved_fields(
+                self, self.maintained_fields)
+        super().save(*args, **kwargs)
+
 
 class Tag(models.Model):
     """Tag model."""
@@ -90,11 +212,51 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ('name', )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='ingredient_name_unit_unique'
+            ),
+        )
 
     def __str__(self) -> str:
         return f'{self.name}, {self.measurement_unit}'
 
 
+class RecipeIngredientQuerySet(models.QuerySet):
+    """Queryset for RecipeIngredient model."""
+
+    def shopping_list(self):
+        """Amounts of ingredients grouped by name and base unit.
+
+        Compatible units are converted to their base unit by one
+        grouped query. A group with a single unit keeps it and its
+        plain sum, amounts of non-summable units are None.
+        """
+
+        unit = 'ingredient__measurement_unit'
+        single_unit = Q(first_unit=F('last_unit'))
+        return self.values(
+            name=F('ingredient__name'),
+            base_unit=base_unit(unit),
+        ).annotate(
+            first_unit=Min(unit),
+            last_unit=Max(unit),
+            measurement_unit=Case(
+                When(single_unit, then=F('first_unit')),
+                default=F('base_unit'),
+            ),
+            amount=Case(
+                When(base_unit__in=NON_SUMMABLE_UNITS, then=Value(None)),
+                When(single_unit, then=Sum('amount')),
+                default=Sum(F('amount') * base_factor(unit)),
+                output_field=AMOUNT_FIELD,
+            ),
+        ).values(
+            'name', 'measurement_unit', 'amount',
+        ).order_by('name', 'measurement_unit')
+
+
 class RecipeIngredient(models.Model):
     """Many2many model for recipe and ingredient."""
 
@@ -114,6 +276,8 @@ class RecipeIngredient(models.Model):
         )
     )
 
+    objects = RecipeIngredientQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -125,3 +289,87 @@ class RecipeIngredient(models.Model):
 
     def __str__(self) -> str:
         return f'{self.ingredient}, {self.amount}'
+
+
+class FeedEntry(models.Model):
+    """Recipe of a followed author in the home feed of a user."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='feed_entry_unique'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    """Precomputed neighbor of a recipe by ingredients and tags."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='similar_recipe_unique'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.recipe}: {self.similar}'
+
+
+class ScoringRun(models.Model):
+    """Time of the last update of recipe scores, a single row."""
+
+    started = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f'{self.started}'
@@ -0,0 +1,110 @@
+from django.db import connection, transaction
+
+from recipes import feed
+from recipes.counters import RECIPE_COUNTERS, change_counters
+from recipes.signals import bump_user_state
+from users.models import User
+
+
+class UserRelation:
+    """Relation of users stored in a M2M through table of User.
+
+    Related manager add() and remove() look up existing rows first,
+    here every change is a single INSERT ... ON CONFLICT DO NOTHING
+    or DELETE which returns ids of really changed rows. m2m_changed
+    isn't sent, so counters and user state are updated explicitly.
+    """
+
+    def __init__(self, field_name):
+        field = User._meta.get_field(field_name)
+        self.through = field.remote_field.through
+        self.target_model = field.remote_field.model
+        self.source_column = field.m2m_column_name()
+        self.target_column = field.m2m_reverse_name()
+        self.counter = RECIPE_COUNTERS.get(self.through)
+
+    def execute(self, sql, params):
+        """Run the statement, returns set of returned target ids."""
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {row[0] for row in cursor.fetchall()}
+
+    def add(self, user, target_ids):
+        """Add existing targets, returns ids of really added ones."""
+
+        target_ids = sorted(set(target_ids))
+        if not target_ids:
+            return set()
+        quote = connection.ops.quote_name
+        target_meta = self.target_model._meta
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        sql = (
+            f'INSERT INTO {quote(self.through._meta.db_table)} '
+            f'({quote(self.source_column)}, {quote(self.target_column)}) '
+            f'SELECT %s, {quote(target_meta.pk.column)} '
+            f'FROM {quote(target_meta.db_table)} '
+            f'WHERE {quote(target_meta.pk.column)} IN ({placeholders}) '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING {quote(self.target_column)}'
+        )
+        with transaction.atomic():
+            added = self.execute(sql, (user.pk, *target_ids))
+            self.changed(user, added, 1)
+        return added
+
+    def remove(self, user, target_ids=None):
+        """Remove targets, all of them if target_ids is None.
+
+        Returns ids of really removed targets.
+        """
+
+        quote = connection.ops.quote_name
+        sql = (
+            f'DELETE FROM {quote(self.through._meta.db_table)} '
+            f'WHERE {quote(self.source_column)} = %s'
+        )
+        params = [user.pk]
+        if target_ids is not None:
+            target_ids = sorted(set(target_ids))
+            if not target_ids:
+                return set()
+            placeholders = ', '.join(['%s'] * len(target_ids))
+            sql += f' AND {quote(self.target_column)} IN ({placeholders})'
+            params += target_ids
+        sql += f' RETURNING {quote(self.target_column)}'
+        with transaction.atomic():
+            removed = self.execute(sql, params)
+            self.changed(user, removed, -1)
+        return removed
+
+    def changed(self, user, target_ids, delta):
+        """Update counters and user state after the change."""
+
+        if not target_ids:
+            return
+        if self.counter is not None:
+            change_counters(
+                self.target_model,
+                self.counter,
+                {target_id: delta for target_id in target_ids}
+            )
+        bump_user_state(user.pk)
+
+
+class SubscriptionRelation(UserRelation):
+    """Subscriptions also change the home feed of the user."""
+
+    def changed(self, user, target_ids, delta):
+        super().changed(user, target_ids, delta)
+        if not target_ids:
+            return
+        if delta > 0:
+            feed.backfill([user.pk], target_ids)
+        else:
+            feed.remove([user.pk], target_ids)
+
+
+favorites = UserRelation('is_favorite')
+shopping_cart = UserRelation('is_in_shopping_cart')
+subscriptions = SubscriptionRelation('is_subscribed')
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from recipes.models import Recipe, ScoringRun
+
+MIN_TRENDING_SCORE = 0.01
+
+
+def activity():
+    """Weighted favorites and cart additions of a recipe."""
+
+    expression = None
+    for field, weight in settings.RECIPE_SCORE_WEIGHTS.items():
+        term = F(field) * weight
+        expression = term if expression is None else expression + term
+    return expression
+
+
+def decay_factor(period, half_life=None):
+    """Part of the trending score left after the period in hours."""
+
+    half_life = half_life or settings.RECIPE_TRENDING_HALF_LIFE
+    return 0.5 ** (period / half_life)
+
+
+def elapsed_decay(half_life=None):
+    """Decay since the previous run, which is stored as the current one.
+
+    The first run doesn't decay. Has to be called in a transaction,
+    concurrent runs wait for it on the locked row.
+    """
+
+    now = timezone.now()
+    run, created = ScoringRun.objects.select_for_update().get_or_create(
+        pk=1, defaults={'started': now})
+    if created:
+        return 1
+    hours = max((now - run.started).total_seconds(), 0) / 3600
+    run.started = now
+    run.save(update_fields=('started', ))
+    return decay_factor(hours, half_life)
+
+
+def update_scores(decay):
+    """Recompute scores of recipes with new activity or trending score.
+
+    trending = trending * decay + activity since the previous run,
+    popularity is the whole activity. Recipes without changes and
+    trending score are skipped, tiny scores are reset to zero.
+    Returns the number of updated recipes.
+    """
+
+    changed = Recipe.objects.filter(
+        ~Q(scored_activity=activity()) | Q(trending_score__gt=0))
+    updated = changed.update(
+        trending_score=F('trending_score') * decay
+        + activity() - F('scored_activity'),
+        popularity_score=activity(),
+        scored_activity=activity(),
+    )
+    Recipe.objects.filter(
+        trending_score__lt=MIN_TRENDING_SCORE
+    ).exclude(trending_score=0).update(trending_score=0)
+    return updated
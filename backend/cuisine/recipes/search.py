@@ -0,0 +1,121 @@
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector)
+from django.db import connection
+from django.db.models import (
+    Case, F, FloatField, OuterRef, Subquery, TextField, Value, When)
+
+from recipes.catalog import normalize
+from recipes.models import Recipe, RecipeIngredient
+from recipes.versions import VersionedCache
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Weights of ts_rank for A (name), B (ingredients) and C (text) labels
+WEIGHTS = {
+    'name': 1.0,
+    'ingredients': 0.4,
+    'text': 0.2,
+}
+
+
+def full_text_search_available():
+    """Postgres has tsvector columns, other databases use the index."""
+
+    return connection.vendor == 'postgresql'
+
+
+def search_vector():
+    """Weighted tsvector of recipe name, ingredient names and text."""
+
+    from django.contrib.postgres.aggregates import StringAgg
+
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names'),
+        output_field=TextField(),
+    )
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(ingredient_names, weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def refresh_search_vectors(recipes):
+    """Recompute search vectors of the recipes queryset."""
+
+    if full_text_search_available():
+        recipes.update(search_vector=search_vector())
+
+
+def tokenize(text):
+    return [normalize(token) for token in TOKEN_RE.findall(text)]
+
+
+class RecipeSearchIndex:
+    """In-process inverted index of recipes.
+
+    Stands in for the tsvector column where full text search
+    isn't available: tokens are matched exactly, without stemming.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        for pk, name in RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient__name').iterator():
+            self.add(pk, name, WEIGHTS['ingredients'])
+        for pk, name, text in Recipe.objects.values_list(
+                'pk', 'name', 'text').iterator():
+            self.add(pk, name, WEIGHTS['name'])
+            self.add(pk, text, WEIGHTS['text'])
+
+    def add(self, pk, text, weight):
+        for token in tokenize(text):
+            scores = self.postings[token]
+            scores[pk] = scores.get(pk, 0) + weight
+
+    def search(self, query):
+        """Ranks of recipes having all tokens of the query."""
+
+        ranks = None
+        for token in set(tokenize(query)):
+            scores = self.postings.get(token, {})
+            if ranks is None:
+                ranks = dict(scores)
+            else:
+                ranks = {
+                    pk: rank + scores[pk]
+                    for pk, rank in ranks.items() if pk in scores
+                }
+        return ranks or {}
+
+
+search_index = VersionedCache('recipes', RecipeSearchIndex)
+
+
+def search_recipes(queryset, query):
+    """Recipes with all words of the query, best matches first.
+
+    The rank is annotated as search_rank.
+    """
+
+    if full_text_search_available():
+        search_query = SearchQuery(
+            query, config=settings.RECIPE_SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+    ranks = search_index.get().search(query)
+    return queryset.filter(pk__in=ranks).annotate(search_rank=Case(
+        *(When(pk=pk, then=Value(rank)) for pk, rank in ranks.items()),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )).order_by('-search_rank', '-pub_date', '-id')
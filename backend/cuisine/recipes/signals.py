@@ -0,0 +1,195 @@
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete)
+from django.dispatch import receiver
+
+from recipes import feed
+from recipes.catalog import catalog
+from recipes.cookable import ingredient_recipe_index
+from recipes.counters import (
+    RECIPE_COUNTERS, change_counters, change_recipe_counter)
+from recipes.images import generate_variants
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import refresh_search_vectors
+from recipes.similar import refresh_similar
+from recipes.tasks import submit_on_commit
+from recipes.versions import (
+    bump_version, forget_versions, remember_versions)
+from users.models import User
+
+
+@receiver(request_started)
+def start_request_versions(**kwargs):
+    """Versions are read once per request."""
+
+    remember_versions()
+
+
+@receiver(request_finished)
+def finish_request_versions(**kwargs):
+    forget_versions()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_catalog(**kwargs):
+    """Tags or ingredients changed, catalog must be rebuilt."""
+
+    transaction.on_commit(catalog.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(**kwargs):
+    """Recipes changed, bumped after commit with all related rows."""
+
+    transaction.on_commit(lambda: bump_version('recipes'))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_ingredient_recipe_index(**kwargs):
+    """Ingredient rows changed outside of the recipe serializer."""
+
+    transaction.on_commit(ingredient_recipe_index.invalidate)
+
+
+@receiver(post_save, sender=User)
+def invalidate_users(update_fields=None, **kwargs):
+    """User profile changed, login time doesn't matter."""
+
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(lambda: bump_version('users'))
+
+
+@receiver(m2m_changed, sender=User.is_favorite.through)
+@receiver(m2m_changed, sender=User.is_in_shopping_cart.through)
+@receiver(m2m_changed, sender=User.is_subscribed.through)
+def invalidate_user_state(instance, action, reverse, pk_set, **kwargs):
+    """Favorites, cart or subscriptions of users changed."""
+
+    if not action.startswith('post_'):
+        return
+    user_ids = pk_set if reverse else {instance.pk}
+    for user_id in user_ids or ():
+        bump_user_state(user_id)
+
+
+def bump_user_state(user_id):
+    """New version of user favorites, cart and subscriptions."""
+
+    transaction.on_commit(lambda: bump_version(f'user-state:{user_id}'))
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    """New recipe of the author."""
+
+    if created:
+        change_counters(User, 'recipes_count', {instance.author_id: 1})
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    """Recipe of the author was deleted."""
+
+    change_counters(User, 'recipes_count', {instance.author_id: -1})
+
+
+@receiver(m2m_changed, sender=User.is_favorite.through)
+@receiver(m2m_changed, sender=User.is_in_shopping_cart.through)
+def update_recipe_counters(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Count users who added recipes to favorites or cart.
+
+    pk_set of post_add holds only really added rows, removed rows
+    are looked up before they are deleted.
+    """
+
+    if action == 'post_add':
+        if reverse:
+            deltas = {instance.pk: len(pk_set)}
+        else:
+            deltas = {recipe_id: 1 for recipe_id in pk_set}
+        change_counters(Recipe, RECIPE_COUNTERS[sender], deltas)
+    elif action in ('pre_remove', 'pre_clear'):
+        if reverse:
+            rows = sender.objects.filter(recipe=instance)
+            if pk_set is not None:
+                rows = rows.filter(user__in=pk_set)
+        else:
+            rows = sender.objects.filter(user=instance)
+            if pk_set is not None:
+                rows = rows.filter(recipe__in=pk_set)
+        change_recipe_counter(sender, rows, -1)
+
+
+@receiver(pre_delete, sender=User)
+def release_recipe_counters(instance, **kwargs):
+    """Favorites and cart rows of the user are deleted by cascade."""
+
+    for through in RECIPE_COUNTERS:
+        change_recipe_counter(
+            through, through.objects.filter(user=instance), -1)
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(instance, **kwargs):
+    """New image of the recipe is resized in the background."""
+
+    if instance.image and instance.variants_of != instance.image.name:
+        submit_on_commit(
+            generate_variants, instance.pk, instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search(instance, **kwargs):
+    """Name or text of the recipe could change."""
+
+    recipes = Recipe.objects.filter(pk=instance.pk)
+    transaction.on_commit(lambda: refresh_search_vectors(recipes))
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_similar_recipes(instance, **kwargs):
+    """Ingredients or tags of the recipe could change.
+
+    Runs after the commit, when the recipes version is bumped
+    and all ingredient rows of the recipe are saved.
+    """
+
+    submit_on_commit(refresh_similar, instance.pk)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def refresh_recipe_ingredients_search(instance, **kwargs):
+    """Ingredients of the recipe changed."""
+
+    recipes = Recipe.objects.filter(pk=instance.recipe_id)
+    transaction.on_commit(lambda: refresh_search_vectors(recipes))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search(instance, created, **kwargs):
+    """Renamed ingredient changes every recipe with it."""
+
+    if created:
+        return
+    recipes = Recipe.objects.filter(
+        pk__in=RecipeIngredient.objects.filter(
+            ingredient=instance).values('recipe'))
+    transaction.on_commit(lambda: refresh_search_vectors(recipes))
+
+
+@receiver(m2m_changed, sender=User.is_subscribed.through)
+def update_feeds(instance, action, reverse, pk_set, **kwargs):
+    """Followed authors fill the home feed, unfollowed leave it."""
+
+    users, authors = (pk_set, [instance.pk]) if reverse else (
+        [instance.pk], pk_set)
+    if action == 'post_add':
+        feed.backfill(users, authors)
+    elif action in ('post_remove', 'post_clear'):
+        feed.remove(users, authors)
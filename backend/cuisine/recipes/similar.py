@@ -0,0 +1,237 @@
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef
+from scipy import sparse
+
+from recipes.counters import count_subquery
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+
+
+def jaccard(common, sizes, other_sizes):
+    """Jaccard similarities from float32 counts of common columns.
+
+    The common array is reused for the result.
+    """
+
+    union = sizes + other_sizes
+    union -= common
+    np.maximum(union, 1, out=union)
+    return np.divide(common, union, out=common)
+
+
+def combined_scores(common, sizes, other_sizes,
+                    common_tags, tag_sizes, other_tag_sizes):
+    """Scores of recipe pairs from ingredient and tag counts."""
+
+    weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+    scores = jaccard(common, sizes, other_sizes)
+    scores *= 1 - weight
+    tag_scores = jaccard(common_tags, tag_sizes, other_tag_sizes)
+    tag_scores *= weight
+    scores += tag_scores
+    return scores
+
+
+def read_pairs(rows):
+    """(recipe_id, column_id) rows as an array of two columns."""
+
+    return np.fromiter(
+        chain.from_iterable(rows.order_by().iterator()), dtype=np.int64
+    ).reshape(-1, 2)
+
+
+class RecipeSimilarity:
+    """Recipes as sparse 0/1 rows of their ingredients and tags.
+
+    A product of the matrix with its transpose counts common
+    ingredients of recipe pairs, so Jaccard similarities of a chunk
+    of recipes with all others are found by one sparse multiplication.
+    Only recipes sharing an ingredient are candidates, tags of most
+    recipes overlap and only add to the score.
+    """
+
+    def __init__(self):
+        ingredients = read_pairs(RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'))
+        tags = read_pairs(Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id'))
+        self.recipe_ids = np.union1d(ingredients[:, 0], tags[:, 0])
+        self.ingredients = self.incidence(ingredients)
+        self.tags = self.incidence(tags).T.toarray().astype(bool)
+        self.ingredient_sizes = np.diff(
+            self.ingredients.indptr).astype(np.float32)
+        self.tag_sizes = self.tags.sum(axis=0).astype(np.float32)
+
+    def incidence(self, pairs):
+        """Sparse matrix of recipes by columns from the pairs."""
+
+        columns = np.unique(pairs[:, 1], return_inverse=True)[1]
+        return sparse.csr_matrix(
+            (
+                np.ones(len(pairs), dtype=np.float32),
+                (np.searchsorted(self.recipe_ids, pairs[:, 0]),
+                 columns.reshape(-1)),
+            ),
+            shape=(len(self.recipe_ids), columns.max(initial=-1) + 1),
+        )
+
+    def row_scores(self, position, columns, common):
+        """Scores of a recipe against candidates in the columns.
+
+        common holds counts of common ingredients, it is reused
+        for the result. The recipe itself scores zero.
+        """
+
+        common_tags = np.zeros(len(columns), dtype=np.float32)
+        for tag in np.flatnonzero(self.tags[:, position]):
+            common_tags += self.tags[tag, columns]
+        scores = combined_scores(
+            common,
+            self.ingredient_sizes[position], self.ingredient_sizes[columns],
+            common_tags,
+            self.tag_sizes[position], self.tag_sizes[columns],
+        )
+        scores[columns == position] = 0
+        return scores
+
+    def neighbors(self, start, stop, limit):
+        """Best candidates of recipes from start to stop positions.
+
+        Returns (recipe_id, similar_id, score) arrays ordered by
+        recipe and decreasing score, at most limit for each recipe.
+        Of equal scores the newer recipes are preferred. Only
+        non-zero entries of the sparse product, recipes with common
+        ingredients, are scored, row by row, so the memory depends
+        on the number of candidates and not on chunk size times
+        number of recipes.
+        """
+
+        common = self.ingredients[start:stop] @ self.ingredients.T
+        rows, columns, values = [], [], []
+        for row in range(common.shape[0]):
+            begin, end = common.indptr[row], common.indptr[row + 1]
+            row_columns = common.indices[begin:end]
+            row_scores = self.row_scores(
+                row + start, row_columns, common.data[begin:end])
+            best = row_scores > 0
+            if np.count_nonzero(best) > limit:
+                threshold = np.partition(
+                    row_scores, len(row_scores) - limit)[-limit]
+                best &= row_scores >= threshold
+            row_scores, row_columns = row_scores[best], row_columns[best]
+            order = np.lexsort((-row_columns, -row_scores))[:limit]
+            rows.append(np.full(len(order), row + start))
+            columns.append(row_columns[order])
+            values.append(row_scores[order])
+        return (
+            self.recipe_ids[np.concatenate(rows)],
+            self.recipe_ids[np.concatenate(columns)],
+            np.concatenate(values),
+        )
+
+
+def recipe_scores(recipe_id):
+    """{similar_id: score} of recipes sharing ingredients with the recipe.
+
+    Candidates and their counts are read by one grouped query over
+    the indexes of ingredient and tag rows, so a saved recipe is
+    scored without loading all recipes.
+    """
+
+    ingredient_ids = list(RecipeIngredient.objects.filter(
+        recipe=recipe_id).order_by().values_list('ingredient_id', flat=True))
+    tag_ids = list(Recipe.tags.through.objects.filter(
+        recipe=recipe_id).values_list('tag_id', flat=True))
+    tags = Recipe.tags.through.objects.filter(recipe=OuterRef('recipe'))
+    rows = RecipeIngredient.objects.filter(
+        ingredient__in=ingredient_ids
+    ).exclude(recipe=recipe_id).order_by().values('recipe').annotate(
+        common=Count('pk'),
+        size=count_subquery(RecipeIngredient.objects.filter(
+            recipe=OuterRef('recipe')), 'recipe'),
+        common_tags=count_subquery(tags.filter(tag__in=tag_ids), 'recipe'),
+        tag_size=count_subquery(tags, 'recipe'),
+    ).values_list('recipe', 'common', 'size', 'common_tags', 'tag_size')
+    rows = np.array(list(rows), dtype=np.int64).reshape(-1, 5)
+    counts = rows[:, 1:].astype(np.float32)
+    scores = combined_scores(
+        counts[:, 0], np.float32(len(ingredient_ids)), counts[:, 1],
+        counts[:, 2], np.float32(len(tag_ids)), counts[:, 3],
+    )
+    return dict(zip(rows[:, 0].tolist(), scores.tolist()))
+
+
+def similar_objects(recipe_ids, similar_ids, scores):
+    """SimilarRecipe objects of the arrays."""
+
+    return [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                      score=score)
+        for recipe_id, similar_id, score
+        in zip(recipe_ids.tolist(), similar_ids.tolist(), scores.tolist())
+    ]
+
+
+@transaction.atomic
+def compute_similar(similarity, limit, chunk_size):
+    """Replaces neighbors of all recipes.
+
+    Recipes are scored in chunks, so the memory is limited by
+    chunk size times number of recipes. Returns number of rows.
+    """
+
+    SimilarRecipe.objects.all().delete()
+    stored = 0
+    for start in range(0, len(similarity.recipe_ids), chunk_size):
+        rows = similar_objects(*similarity.neighbors(
+            start, start + chunk_size, limit))
+        SimilarRecipe.objects.bulk_create(rows)
+        stored += len(rows)
+    return stored
+
+
+def best(scores, limit):
+    """Items of {similar_id: score} with the highest scores."""
+
+    return sorted(
+        scores.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+
+
+@transaction.atomic
+def refresh_similar(recipe_id):
+    """Updates neighbors of a saved recipe and lists it can enter.
+
+    Lists of recipes which are among the new neighbors or had
+    the recipe before are merged with its new scores and cut
+    to the limit, other lists wait for compute_similar_recipes.
+    Rows written by a concurrent refresh of another recipe win.
+    """
+
+    if not Recipe.objects.filter(pk=recipe_id).exists():
+        return
+    limit = settings.SIMILAR_RECIPES_COUNT
+    scores = recipe_scores(recipe_id)
+    neighbors = dict(best(scores, limit))
+    affected = set(neighbors) | set(
+        SimilarRecipe.objects.filter(similar=recipe_id).values_list(
+            'recipe_id', flat=True))
+    lists = {other_id: {} for other_id in affected}
+    for row in SimilarRecipe.objects.filter(recipe__in=affected).exclude(
+            similar=recipe_id):
+        lists[row.recipe_id][row.similar_id] = row.score
+    for other_id in affected & scores.keys():
+        lists[other_id][recipe_id] = scores[other_id]
+    lists[recipe_id] = neighbors
+    SimilarRecipe.objects.filter(recipe__in=lists.keys()).delete()
+    SimilarRecipe.objects.bulk_create(
+        (
+            SimilarRecipe(
+                recipe_id=other_id, similar_id=similar_id, score=score)
+            for other_id, other_scores in lists.items()
+            for similar_id, score in best(other_scores, limit)
+        ),
+        ignore_conflicts=True,
+    )
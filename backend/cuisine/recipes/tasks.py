@@ -0,0 +1,33 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.BACKGROUND_TASK_WORKERS,
+    thread_name_prefix='background-task',
+)
+
+
+def run(func, args):
+    """Runs the task, failures are only logged."""
+
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        connection.close()
+
+
+def submit_on_commit(func, *args):
+    """Runs func(*args) in the thread pool of workers after commit.
+
+    The pool is local to the process, tasks which weren't finished
+    are lost on restart, so they have to be repeatable.
+    """
+
+    transaction.on_commit(lambda: executor.submit(run, func, args))
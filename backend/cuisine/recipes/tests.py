@@ -0,0 +1,130 @@
+import re
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.paginator import RecipeFeedPagination
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.relations import favorites, shopping_cart, subscriptions
+from recipes.search import refresh_search_vectors
+from users.models import User
+
+LARGE_TABLES = (
+    'recipes_feedentry',
+    'recipes_recipe',
+    'recipes_recipeingredient',
+    'recipes_similarrecipe',
+    'recipes_recipe_tags',
+    'users_user_is_favorite',
+    'users_user_is_in_shopping_cart',
+    'users_user_is_subscribed',
+)
+
+
+class QueryPlansTest(TestCase):
+    """Main queries of the API don't scan large tables sequentially.
+
+    Queries are captured from requests to the API. Tables of the test
+    database are small, so sequential scans are turned off on
+    PostgreSQL and only queries without a usable index still scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='pass',
+            first_name='First', last_name='Last')
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='First', last_name='Last')
+        tag = Tag.objects.create(name='Tag', color='#000000', slug='tag')
+        ingredient = Ingredient.objects.create(
+            name='Ingredient', measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Recipe', text='Text',
+            image='recipe/image.png', cooking_time=10)
+        cls.recipe.tags.add(tag)
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=ingredient, amount=1)
+        refresh_search_vectors(Recipe.objects.all())
+        subscriptions.add(cls.user, [author.pk])
+        favorites.add(cls.user, [cls.recipe.pk])
+        shopping_cart.add(cls.user, [cls.recipe.pk])
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def get_urls(self):
+        """Main requests of the API, as (title, url)."""
+
+        pk = self.recipe.pk
+        cursor = RecipeFeedPagination().encode_cursor(
+            (self.recipe.pub_date, pk + 1))
+        return (
+            ('recipe feed', '/api/recipes/'),
+            ('recipe feed by cursor', f'/api/recipes/?cursor={cursor}'),
+            ('popular recipes', '/api/recipes/?ordering=popular'),
+            ('trending recipes', '/api/recipes/?ordering=trending'),
+            ('recipe detail', f'/api/recipes/{pk}/'),
+            ('similar recipes', f'/api/recipes/{pk}/similar/'),
+            ('recipe feed by tags', '/api/recipes/?tags=tag'),
+            ('favorites and cart',
+             '/api/recipes/?is_favorited=1&is_in_shopping_cart=1'),
+            ('recipe search', '/api/recipes/?search=Recipe'),
+            ('home feed', '/api/recipes/feed/'),
+            ('subscriptions', '/api/users/subscriptions/?recipes_limit=3'),
+            ('shopping list', '/api/recipes/download_shopping_cart/'),
+        )
+
+    def get_queries(self, url):
+        """SELECT queries run by the API for a GET of the url.
+
+        Counts of page number pagination read all matching rows
+        anyway, cursor pagination is there to avoid them.
+        """
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and not query['sql'].startswith('SELECT COUNT(*)')
+        ]
+
+    def explain(self, sql):
+        """Plan of the query as text."""
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+
+    def sequential_scans(self, plan):
+        """Large tables scanned without index in the plan."""
+
+        if connection.vendor == 'postgresql':
+            pattern = r'Seq Scan on (\w+)'
+        else:
+            pattern = r'SCAN (?:TABLE )?(\w+)(?! USING)(?:\s|$)'
+        return {
+            table for table in re.findall(pattern, plan)
+            if table in LARGE_TABLES
+        }
+
+    def test_no_sequential_scans(self):
+        for title, url in self.get_urls():
+            for sql in self.get_queries(url):
+                with self.subTest(title, sql=sql):
+                    plan = self.explain(sql)
+                    self.assertFalse(self.sequential_scans(plan), plan)
@@ -0,0 +1,47 @@
+from django.db.models import Case, CharField, DecimalField, Value, When
+
+# Units which are converted to a common base unit: unit -> (base, factor)
+UNIT_CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'стакан': ('мл', 250),
+    'ст. л.': ('мл', 15),
+    'ч. л.': ('мл', 5),
+}
+
+# Units without a meaningful amount, they are listed without a sum
+NON_SUMMABLE_UNITS = ('по вкусу', )
+
+# Sums of converted amounts, enough for the largest factor
+AMOUNT_FIELD = DecimalField(max_digits=15, decimal_places=1)
+
+
+def base_unit(unit_field):
+    """Expression of the base unit of the unit field.
+
+    Units missing from UNIT_CONVERSIONS are their own base.
+    """
+
+    bases = {}
+    for unit, (base, factor) in UNIT_CONVERSIONS.items():
+        bases.setdefault(base, []).append(unit)
+    return Case(
+        *(When(**{f'{unit_field}__in': units}, then=Value(base))
+          for base, units in bases.items()),
+        default=unit_field,
+        output_field=CharField(),
+    )
+
+
+def base_factor(unit_field):
+    """Expression of the factor converting the unit field to its base."""
+
+    return Case(
+        *(When(**{unit_field: unit}, then=Value(factor))
+          for unit, (base, factor) in UNIT_CONVERSIONS.items()
+          if factor != 1),
+        default=Value(1),
+        output_field=AMOUNT_FIELD,
+    )
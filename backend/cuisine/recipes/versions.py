@@ -0,0 +1,127 @@
+import threading
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from recipes.tasks import executor, run
+
+
+# Versions read by the current request, None outside of requests
+request_versions = threading.local()
+
+
+def remember_versions():
+    """Starts keeping versions read by the request of this thread."""
+
+    request_versions.versions = {}
+
+
+def forget_versions():
+    request_versions.versions = None
+
+
+def get_versions(*keys):
+    """Returns current version tokens of the keys.
+
+    Versions missing from the request are read by one cache query,
+    so ETags and caches of a request see the same versions.
+    """
+
+    versions = getattr(request_versions, 'versions', None)
+    if versions is None:
+        versions = {}
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        found = cache.get_many([f'version:{key}' for key in missing])
+        for key in missing:
+            version = found.get(f'version:{key}')
+            if version is None:
+                cache.add(f'version:{key}', uuid4().hex, timeout=None)
+                version = cache.get(f'version:{key}')
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def get_version(key):
+    """Returns current version token of the key."""
+
+    return get_versions(key)[0]
+
+
+def bump_version(key):
+    """Sets a new version token for the key.
+
+    Tokens are random, so a version lost from the cache
+    can't come back with the same value.
+    """
+
+    version = uuid4().hex
+    cache.set(f'version:{key}', version, timeout=None)
+    versions = getattr(request_versions, 'versions', None)
+    if versions is not None:
+        versions[key] = version
+
+
+class VersionedCache:
+    """Value kept in the process and rebuilt when its version changes.
+
+    Without a version, when the cache is unavailable, it is rebuilt
+    on every call.
+    """
+
+    def __init__(self, key, builder):
+        self.key = key
+        self.builder = builder
+        self.version = None
+        self.value = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Returns the value for the current version."""
+
+        version = get_version(self.key)
+        if version is None or version != self.version:
+            with self.lock:
+                if version is None or version != self.version:
+                    self.value = self.builder()
+                    self.version = version
+        return self.value
+
+    def invalidate(self):
+        """Marks the value as outdated in every process."""
+
+        bump_version(self.key)
+
+
+class BackgroundVersionedCache(VersionedCache):
+    """Versioned value rebuilt by a background task.
+
+    Only the first value is built by the caller, later versions
+    are built by a background worker while the old value is served.
+    """
+
+    def __init__(self, key, builder):
+        super().__init__(key, builder)
+        self.rebuilding = False
+
+    def get(self):
+        """Returns the last built value, starts a rebuild if it is outdated."""
+
+        if self.value is None:
+            return super().get()
+        version = get_version(self.key)
+        if version is None or version != self.version:
+            with self.lock:
+                if not self.rebuilding:
+                    self.rebuilding = True
+                    executor.submit(run, self.rebuild, (version, ))
+        return self.value
+
+    def rebuild(self, version):
+        try:
+            value = self.builder()
+            with self.lock:
+                self.value = value
+                self.version = version
+        finally:
+            self.rebuilding = False
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='fan_out_on_read',
+            field=models.BooleanField(default=False, editable=False, help_text='Author has too many followers, the recipes are read by followers instead of copying to their feeds'),
+        ),
+    ]
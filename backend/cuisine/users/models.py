@@ -2,6 +2,15 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
+def saved_fields(instance, excluded):
+    """Names of the fields to save on update, without excluded ones."""
+
+    return [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in excluded
+    ]
+
+
 class User(AbstractUser):
     """User model."""
 
@@ -37,10 +46,31 @@ class User(AbstractUser):
         'recipes.Recipe',
         related_name='is_in_shopping_cart',
         blank=True)
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Number of recipes',
+    )
+    fan_out_on_read = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text=('Author has too many followers, the recipes are read '
+                   'by followers instead of copying to their feeds'),
+    )
+
+    maintained_fields = ('recipes_count', 'fan_out_on_read')
 
     class Meta:
         ordering = ('id', )
 
+    def save(self, *args, **kwargs):
+        """Maintained columns are changed only with queryset updates."""
+
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = saved_fields(
+                self, self.maintained_fields)
+        super().save(*args, **kwargs)
+
     @property
     def is_admin(self):
         """Return True if user is Admin."""